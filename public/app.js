@@ -1,30 +1,146 @@
 let galleryLookup = {};
 let galleryList = [];
+let accessSalt = null;
+let coverSprites = [];
 let currentGallery = null;
 let currentPhotos = [];
 let currentPhotoIndex = 0;
 let currentZip = null;
 let masonryInstance = null;
 
+// Photos are objects ({ file, width, variants }) in current payloads and bare
+// filenames in older ones; both shapes are accepted everywhere.
+function photoFile(photo) {
+    return typeof photo === 'string' ? photo : photo.file;
+}
+
+// Gallery names and file names contain spaces and '&'; a raw space would split
+// a srcset candidate, so every path segment is percent-encoded.
+function assetUrl(...segments) {
+    return segments.map(segment => encodeURIComponent(String(segment))).join('/');
+}
+
+// Only advertise widths that were actually generated at build time, so the
+// browser never downloads the full-size file when a smaller one exists.
+// Derivatives may use a different encoder (e.g. WebP) than the original.
+function buildSrcSet(gallery, photo) {
+    if (!gallery || !photo || typeof photo === 'string' || !photo.width) return '';
+    // Fingerprinted deploys list each variant's hashed name in variantFiles
+    const variantFile = gallery.variantExt ? photo.file.replace(/\.[^.]+$/, gallery.variantExt) : photo.file;
+    const variantName = w => (photo.variantFiles && photo.variantFiles[w]) || variantFile;
+    const candidates = (photo.variants || []).map(w => `${assetUrl('derivatives', gallery.name, w, variantName(w))} ${w}w`);
+    candidates.push(`${assetUrl('images', gallery.name, photo.file)} ${photo.width}w`);
+    return candidates.join(', ');
+}
+
+// Minimal BlurHash decoder (https://blurha.sh) for the placeholders computed at build time
+const BLURHASH_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+const placeholderCache = {};
+
+function decode83(str) {
+    let value = 0;
+    for (const c of str) value = value * 83 + BLURHASH_CHARS.indexOf(c);
+    return value;
+}
+
+function srgbToLinear(value) {
+    const v = value / 255;
+    return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+}
+
+function linearToSrgb(value) {
+    const v = Math.max(0, Math.min(1, value));
+    return v <= 0.0031308 ? Math.round(v * 12.92 * 255) : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+}
+
+function signPow(value, exp) {
+    return Math.sign(value) * Math.pow(Math.abs(value), exp);
+}
+
+function blurhashToDataURL(hash, width = 32, height = 32) {
+    if (!hash || hash.length < 6) return '';
+    if (placeholderCache[hash]) return placeholderCache[hash];
+    const sizeFlag = decode83(hash[0]);
+    const nx = (sizeFlag % 9) + 1;
+    const ny = Math.floor(sizeFlag / 9) + 1;
+    if (hash.length !== 4 + 2 * nx * ny) return '';
+
+    const maxValue = (decode83(hash[1]) + 1) / 166;
+    const dc = decode83(hash.substring(2, 6));
+    const colors = [[srgbToLinear(dc >> 16), srgbToLinear((dc >> 8) & 255), srgbToLinear(dc & 255)]];
+    for (let i = 1; i < nx * ny; i++) {
+        const v = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+        colors.push([
+            signPow((Math.floor(v / 361) - 9) / 9, 2) * maxValue,
+            signPow((Math.floor(v / 19) % 19 - 9) / 9, 2) * maxValue,
+            signPow((v % 19 - 9) / 9, 2) * maxValue
+        ]);
+    }
+
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    const ctx = canvas.getContext('2d');
+    if (!ctx) return '';
+    const image = ctx.createImageData(width, height);
+    for (let y = 0; y < height; y++) {
+        for (let x = 0; x < width; x++) {
+            let r = 0, g = 0, b = 0;
+            for (let j = 0; j < ny; j++) {
+                for (let i = 0; i < nx; i++) {
+                    const basis = Math.cos(Math.PI * x * i / width) * Math.cos(Math.PI * y * j / height);
+                    const color = colors[i + j * nx];
+                    r += color[0] * basis;
+                    g += color[1] * basis;
+                    b += color[2] * basis;
+                }
+            }
+            const idx = 4 * (x + y * width);
+            image.data[idx] = linearToSrgb(r);
+            image.data[idx + 1] = linearToSrgb(g);
+            image.data[idx + 2] = linearToSrgb(b);
+            image.data[idx + 3] = 255;
+        }
+    }
+    ctx.putImageData(image, 0, 0);
+    placeholderCache[hash] = canvas.toDataURL();
+    return placeholderCache[hash];
+}
+
+// Photos with build-time dimensions reserve their box up front, so Masonry can
+// lay the grid out once instead of after every image load.
+function photoHasDimensions(photo) {
+    return Boolean(photo && typeof photo !== 'string' && photo.width && photo.height);
+}
+
+function photoItemClass(photo) {
+    return photoHasDimensions(photo) ? 'photo-item has-dimensions' : 'photo-item';
+}
+
+function photoItemStyle(photo) {
+    if (!photoHasDimensions(photo)) return '';
+    const preview = blurhashToDataURL(photo.placeholder);
+    const background = preview ? ` background-image: url(${preview}); background-size: cover;` : '';
+    return `aspect-ratio: ${photo.width} / ${photo.height};${background}`;
+}
+
+function photoSizeAttrs(photo) {
+    return photoHasDimensions(photo) ? `width="${photo.width}" height="${photo.height}"` : '';
+}
+
+function gridNeedsImageSizes(gridElement) {
+    return Boolean(gridElement.querySelector('.photo-item:not(.has-dimensions)'));
+}
+
 async function loadGalleries() {
     try {
         const response = await fetch('images/galleries.json');
         if (!response.ok) throw new Error('Failed to load galleries');
         const data = await response.json();
         galleryList = data.galleries || [];
-        try {
-            const secretsResponse = await fetch('secrets.json');
-            if (secretsResponse.ok) {
-                const secrets = await secretsResponse.json();
-                galleryList = galleryList.map(g => ({
-                    ...g,
-                    password: g.password || secrets[g.name]?.password || '',
-                    downloadLink: g.downloadLink || secrets[g.name]?.downloadLink || ''
-                }));
-            }
-        } catch (err) {
-            console.warn('Secrets not loaded (fallback):', err);
-        }
+        // Indexes from older builds have no salt, and their galleries cannot be unlocked
+        accessSalt = typeof data.accessSalt === 'string' ? data.accessSalt : null;
+        coverSprites = Array.isArray(data.coverSprites) ? data.coverSprites : [];
         galleryLookup = {};
         galleryList.forEach(g => {
             if (g && g.name) {
@@ -35,22 +151,25 @@ async function loadGalleries() {
 
         // Responsive hints for covers to avoid over-downloading on small screens
         const coverSizes = '(min-width: 1200px) 33vw, (min-width: 768px) 45vw, 90vw';
-        const buildSrcSet = (src) => `${src} 640w, ${src} 960w, ${src} 1440w`;
         
-        // First 3 galleries should load eagerly
+        // First 3 galleries should load eagerly, unless a sprite sheet already paints them
         const eagerLoadCount = 3;
         
         albumsGrid.innerHTML = galleryList.map((gallery, index) => {
-            const isEager = index < eagerLoadCount;
+            const sheet = gallery.sprite && coverSprites[gallery.sprite.sheet];
+            const isEager = !sheet && index < eagerLoadCount;
+            const coverEntry = gallery.cover || (gallery.photos || []).find(p => photoFile(p) === gallery.coverPhoto);
+            const coverSrcSet = buildSrcSet(gallery, coverEntry);
             
             return `
             <article class="card album-card" data-album="${gallery.name}" onclick="promptPassword('${gallery.name}')">
                 <div class="card-image">
                     <div class="image-overlay"></div>
-                    ${!isEager ? '<div class="skeleton"></div>' : ''}
+                    ${sheet ? `<div class="cover-sprite" data-album="${gallery.name}" style="background-image: url('${sheet.url}');"></div>` : ''}
+                    ${!isEager && !sheet ? '<div class="skeleton"></div>' : ''}
                     <img id="cover-${gallery.name}" 
-                         ${isEager ? `src="images/${gallery.name}/${gallery.coverPhoto}"` : `data-src="images/${gallery.name}/${gallery.coverPhoto}"`}
-                         ${isEager ? `srcset="${buildSrcSet(`images/${gallery.name}/${gallery.coverPhoto}`)}"` : `data-srcset="${buildSrcSet(`images/${gallery.name}/${gallery.coverPhoto}`)}"`}
+                         ${isEager ? `src="${assetUrl('images', gallery.name, gallery.coverPhoto)}"` : `data-src="${assetUrl('images', gallery.name, gallery.coverPhoto)}"`}
+                         ${isEager ? `srcset="${coverSrcSet}"` : `data-srcset="${coverSrcSet}"`}
                          sizes="${coverSizes}"
                          alt="${gallery.title}" 
                          class="${isEager ? 'eager-cover-img' : 'lazy-cover-img'}"
@@ -69,6 +188,7 @@ async function loadGalleries() {
         `;
         }).join('');
         
+        layoutCoverSprites();
         // Initialize lazy loading for cover images (only for lazy-loaded ones)
         initializeLazyLoading();
     } catch (error) {
@@ -77,6 +197,22 @@ async function loadGalleries() {
     }
 }
 
+// Show each card's cell of its sprite sheet like object-fit: cover (cells are padded, so nothing bleeds)
+function layoutCoverSprites() {
+    document.querySelectorAll('.cover-sprite').forEach(el => {
+        const cell = galleryLookup[el.dataset.album]?.sprite;
+        const sheet = cell && coverSprites[cell.sheet];
+        const width = el.clientWidth;
+        const height = el.clientHeight;
+        if (!sheet || !width || !height) return;
+        const scale = Math.max(width / cell.w, height / cell.h);
+        el.style.backgroundSize = `${sheet.width * scale}px ${sheet.height * scale}px`;
+        el.style.backgroundPosition = `${(width - cell.w * scale) / 2 - cell.x * scale}px ${(height - cell.h * scale) / 2 - cell.y * scale}px`;
+    });
+}
+
+window.addEventListener('resize', debounce(layoutCoverSprites, 150));
+
 // Improved Intersection Observer for lazy loading with mobile optimizations
 function initializeLazyLoading() {
     // Check if IntersectionObserver is supported
@@ -154,8 +290,9 @@ function initializeLazyLoading() {
                                 photoItem.classList.add('image-loaded');
                             }
                             
-                            // Update masonry layout when image loads
-                            if (masonryInstance && img.closest('.photo-grid')) {
+                            // Update masonry layout when image loads (only needed when
+                            // the payload did not carry the photo's dimensions)
+                            if (masonryInstance && img.closest('.photo-grid') && !img.closest('.photo-item.has-dimensions')) {
                                 updateMasonryLayout();
                             }
                         };
@@ -204,8 +341,11 @@ function initializeMasonry(gridElement) {
         initLayout: false // Don't layout immediately, wait for images
     });
     
-    // Use imagesLoaded to layout after images load
-    if (typeof imagesLoaded !== 'undefined') {
+    // Every item already has its final size, so lay out once right away
+    if (!gridNeedsImageSizes(gridElement)) {
+        masonryInstance.layout();
+    } else if (typeof imagesLoaded !== 'undefined') {
+        // Use imagesLoaded to layout after images load
         imagesLoaded(gridElement, function() {
             masonryInstance.layout();
         });
@@ -220,7 +360,10 @@ function initializeMasonry(gridElement) {
 // Update masonry layout (for dynamic content)
 function updateMasonryLayout() {
     if (masonryInstance) {
-        if (typeof imagesLoaded !== 'undefined') {
+        if (!gridNeedsImageSizes(masonryInstance.element)) {
+            masonryInstance.reloadItems();
+            masonryInstance.layout();
+        } else if (typeof imagesLoaded !== 'undefined') {
             imagesLoaded(masonryInstance.element, function() {
                 masonryInstance.reloadItems();
                 masonryInstance.layout();
@@ -244,16 +387,38 @@ function closePasswordPrompt() {
     document.getElementById('passwordModal').style.display = 'none';
 }
 
-function checkAlbumPasscode() {
+// Same key as gallery_wizard.access_key(): sha256 of salt, name and passcode, one per line
+async function accessKey(name, passcode) {
+    const bytes = new TextEncoder().encode(`${accessSalt}\n${name}\n${passcode}`);
+    const digest = await crypto.subtle.digest('SHA-256', bytes);
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('').slice(0, 32);
+}
+
+// Resolves to { downloadLink } when the passcode opens the gallery, otherwise null
+async function unlockGallery(gallery, passcode) {
+    if (accessSalt === null) return null;
+    const key = await accessKey(gallery.name, gallery.locked ? passcode : '');
+    const response = await fetch(`access/${key}.json`);
+    return response.ok ? response.json() : null;
+}
+
+async function checkAlbumPasscode() {
     const passcode = document.getElementById('albumPasscodeInput').value;
     const errorElement = document.getElementById('passwordError');
-    const galleryPass = galleryLookup[currentGallery]?.password || '';
-    if (galleryPass && galleryPass === passcode) {
-        loadGallery(currentGallery);
-        closePasswordPrompt();
+    const gallery = galleryLookup[currentGallery];
+    if (!gallery) return;
+    let access = null;
+    try {
+        access = await unlockGallery(gallery, passcode);
+    } catch (err) {
+        console.warn('Gallery access check failed:', err);
+        errorElement.textContent = window.isSecureContext
+            ? 'Could not check the passcode. Please try again.'
+            : 'Galleries can only be unlocked over HTTPS.';
         return;
     }
-    if (!galleryPass) {
+    if (access) {
+        gallery.downloadLink = access.downloadLink || '';
         loadGallery(currentGallery);
         closePasswordPrompt();
         return;
@@ -270,9 +435,22 @@ async function loadGallery(album) {
         const gallery = galleryLookup[album];
         if (!gallery) throw new Error('Gallery not found');
         let photos = gallery.photos || [];
+        // The homepage index only lists covers; each gallery's photo list lives in its own shard
+        if (!photos.length && gallery.shard) {
+            try {
+                const shardResponse = await fetch(gallery.shard);
+                if (shardResponse.ok) {
+                    const shard = await shardResponse.json();
+                    photos = shard.photos || [];
+                    gallery.photos = photos;
+                }
+            } catch (err) {
+                console.warn('Gallery shard failed to load:', err);
+            }
+        }
         if (!photos.length) {
             try {
-                const manifestResponse = await fetch(`images/${album}/manifest.json`);
+                const manifestResponse = await fetch(assetUrl('images', album, 'manifest.json'));
                 if (manifestResponse.ok) {
                     photos = await manifestResponse.json();
                 }
@@ -282,7 +460,7 @@ async function loadGallery(album) {
         }
         const downloadLink = gallery.downloadLink || '#';
 
-        currentPhotos = photos.map(photo => `images/${gallery.name}/${photo}`);
+        currentPhotos = photos.map(photo => assetUrl('images', gallery.name, photoFile(photo)));
 
         // Use virtual scrolling for galleries with many images
         // Lower threshold on mobile to improve performance
@@ -304,7 +482,6 @@ async function loadGallery(album) {
 
 function loadGalleryNormal(album, photos, downloadLink) {
     const photoSizes = '(min-width: 1200px) 22vw, (min-width: 900px) 28vw, (min-width: 600px) 42vw, 90vw';
-    const buildSrcSet = (src) => `${src} 640w, ${src} 960w, ${src} 1400w`;
     const galleryHTML = `
         <section class="gallery">
             <header class="gallery-header">
@@ -320,9 +497,9 @@ function loadGalleryNormal(album, photos, downloadLink) {
                 <div class="photo-grid-sizer"></div>
                 <div class="photo-grid-gutter-sizer"></div>
                 ${photos.map((photo, index) => `
-                    <div class="photo-item" id="photoItem-${index}" onclick="openLightbox(${index})">
-                        <div class="skeleton"></div>
-                        <img src="" alt="${photo}" class="lazy-img" loading="lazy" decoding="async" sizes="${photoSizes}" style="opacity: 0;">
+                    <div class="${photoItemClass(photo)}" id="photoItem-${index}" onclick="openLightbox(${index})" style="${photoItemStyle(photo)}">
+                        ${photoHasDimensions(photo) ? '' : '<div class="skeleton"></div>'}
+                        <img src="" alt="${photoFile(photo)}" ${photoSizeAttrs(photo)} class="lazy-img" loading="lazy" decoding="async" sizes="${photoSizes}" style="opacity: 0;">
                     </div>
                 `).join('')}
             </div>
@@ -338,8 +515,8 @@ function loadGalleryNormal(album, photos, downloadLink) {
     // Load images with data-src for lazy loading
     const imgElements = document.querySelectorAll('.photo-item img');
     imgElements.forEach((imgElement, index) => {
-        imgElement.dataset.src = `images/${album}/${photos[index]}`;
-        imgElement.dataset.srcset = buildSrcSet(`images/${album}/${photos[index]}`);
+        imgElement.dataset.src = assetUrl('images', album, photoFile(photos[index]));
+        imgElement.dataset.srcset = buildSrcSet(galleryLookup[album], photos[index]);
     });
     
     // Initialize masonry layout
@@ -356,7 +533,6 @@ function loadGalleryWithVirtualScrolling(album, photos, downloadLink) {
     const slow = isSlowConnection();
     const BATCH_SIZE = (isMobile || slow) ? 10 : 20; // Render fewer images on mobile/slow connections
     const photoSizes = '(min-width: 1200px) 22vw, (min-width: 900px) 28vw, (min-width: 600px) 42vw, 90vw';
-    const buildSrcSet = (src) => `${src} 640w, ${src} 960w, ${src} 1400w`;
     let renderedCount = 0;
     let masonryInitialized = false;
 
@@ -393,13 +569,14 @@ function loadGalleryWithVirtualScrolling(album, photos, downloadLink) {
 
         for (let i = renderedCount; i < end; i++) {
             const div = document.createElement('div');
-            div.className = 'photo-item';
+            div.className = photoItemClass(photos[i]);
             div.id = `photoItem-${i}`;
             div.onclick = () => openLightbox(i);
+            div.style.cssText = photoItemStyle(photos[i]);
             
             div.innerHTML = `
-                <div class="skeleton"></div>
-                <img data-src="images/${album}/${photos[i]}" data-srcset="${buildSrcSet(`images/${album}/${photos[i]}`)}" alt="${photos[i]}" class="lazy-img" loading="lazy" decoding="async" sizes="${photoSizes}" style="opacity: 0;">
+                ${photoHasDimensions(photos[i]) ? '' : '<div class="skeleton"></div>'}
+                <img data-src="${assetUrl('images', album, photoFile(photos[i]))}" data-srcset="${buildSrcSet(galleryLookup[album], photos[i])}" alt="${photoFile(photos[i])}" ${photoSizeAttrs(photos[i])} class="lazy-img" loading="lazy" decoding="async" sizes="${photoSizes}" style="opacity: 0;">
             `;
             fragment.appendChild(div);
         }
@@ -0,0 +1,123 @@
+import os
+import shutil
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from build_cache import file_sha256
+from resize_engine import ResizeResult
+
+ROOT = Path(__file__).resolve().parent.parent
+ARCHIVES_DIR = ROOT / "archives"
+# Already-compressed formats are stored as-is; deflating them only burns CPU.
+STORED_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".avif", ".heic", ".gif", ".mp4", ".mov", ".zip"}
+CHUNK_SIZE = 1 << 20
+
+
+def source_files(source: Path) -> List[Path]:
+    """Every non-hidden file under ``source``, in a stable order."""
+    files = []
+    for root, dirs, names in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        files.extend(Path(root) / n for n in sorted(names) if not n.startswith("."))
+    return files
+
+
+def checksum_path(archive: Path) -> Path:
+    return archive.with_name(archive.name + ".sha256")
+
+
+def read_checksum(archive: Path) -> str:
+    """The sha256 recorded next to ``archive`` (``sha256sum`` format), or ""."""
+    try:
+        return checksum_path(archive).read_text(encoding="utf-8").split()[0]
+    except (OSError, IndexError):
+        return ""
+
+
+def members(source: Path) -> List[Tuple[str, int, tuple]]:
+    """``(name, size, mtime)`` of each file ``package_one`` would zip from ``source``."""
+    infos = (zipfile.ZipInfo.from_file(p, p.relative_to(source).as_posix()) for p in source_files(source))
+    # Zip timestamps have two-second resolution; odd seconds are stored rounded down.
+    return [(i.filename, i.file_size, i.date_time[:5] + (i.date_time[5] // 2 * 2,)) for i in infos]
+
+
+def archived_members(archive: Path) -> List[Tuple[str, int, tuple]]:
+    """``(name, size, mtime)`` of each file in ``archive``, read from its central directory."""
+    with zipfile.ZipFile(archive) as zf:
+        return [(i.filename, i.file_size, i.date_time) for i in zf.infolist()]
+
+
+def is_current(source: Path, archive: Path) -> bool:
+    """True when ``archive`` holds exactly the files in ``source`` and none changed since.
+
+    Comparing the member lists catches originals that were deleted,
+    renamed or added; the mtime check catches edits that land within the
+    same two-second zip timestamp.
+    """
+    if not archive.exists() or not read_checksum(archive):
+        return False
+    try:
+        if archived_members(archive) != members(source):
+            return False
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return False
+    built = archive.stat().st_mtime_ns
+    return all(p.stat().st_mtime_ns <= built for p in source_files(source))
+
+
+def package_one(source: str, archive: str) -> ResizeResult:
+    """Zip ``source`` into ``archive`` and write its ``.sha256`` sidecar.
+
+    Files are copied into the zip in 1 MB chunks, so memory stays flat no
+    matter how large the originals are. The archive is built under a
+    temporary name and renamed into place, so a failed run never leaves a
+    truncated zip behind. Runs inside worker processes and never raises.
+    """
+    source_dir, dest = Path(source), Path(archive)
+    tmp = dest.with_name(dest.name + ".tmp")
+    try:
+        files = source_files(source_dir)
+        if not files:
+            return ResizeResult(archive, f"no files in {source_dir}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        bytes_in = 0
+        with zipfile.ZipFile(tmp, "w", allowZip64=True) as zf:
+            for path in files:
+                info = zipfile.ZipInfo.from_file(path, path.relative_to(source_dir).as_posix())
+                stored = path.suffix.lower() in STORED_EXTS
+                info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+                with open(path, "rb") as src, zf.open(info, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as out:
+                    shutil.copyfileobj(src, out, CHUNK_SIZE)
+                bytes_in += info.file_size
+        digest = file_sha256(tmp)
+        os.replace(tmp, dest)
+        checksum_path(dest).write_text(f"{digest}  {dest.name}\n", encoding="utf-8")
+    except (OSError, ValueError, zipfile.BadZipFile) as exc:
+        tmp.unlink(missing_ok=True)
+        return ResizeResult(archive, f"{type(exc).__name__}: {exc}")
+    return ResizeResult(archive, bytes_in=bytes_in, bytes_out=dest.stat().st_size)
+
+
+def archive_path(out_dir: Path, slug: str) -> Path:
+    return out_dir / f"{slug}.zip"
+
+
+def relative_to_root(path: Path) -> str:
+    try:
+        return path.resolve().relative_to(ROOT).as_posix()
+    except ValueError:
+        return path.resolve().as_posix()
+
+
+def originals_folder(entry: dict, source_root: Optional[Path]) -> Optional[Path]:
+    """Where a gallery's full-resolution files live.
+
+    An ``originals`` path in the registry entry wins (relative paths are
+    resolved from the repo root); otherwise ``<source_root>/<folder>``.
+    """
+    if entry.get("originals"):
+        return ROOT / Path(entry["originals"]).expanduser()
+    if source_root is not None:
+        return source_root / entry.get("folder", entry.get("name", ""))
+    return None
@@ -0,0 +1,301 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import PIL
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is reported as null
+    resource = None
+
+import derivatives
+import gallery_wizard
+from build_cache import BuildCache
+from encoders import DEFAULT_PROFILE, PROFILES
+from resize_engine import default_jobs, parse_memory, resize_files
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "utils"))
+
+from gallery_generator import generate_galleries_json  # noqa: E402
+from manifest_generator import generate_manifest  # noqa: E402
+
+RESULTS_DIR = ROOT / ".cache" / "bench"
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+BASE_VARIANTS = 4
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got '{value}'")
+    return width, height
+
+
+def _base_image(size: Tuple[int, int], seed: int) -> Image.Image:
+    # Smooth gradients plus coarse and fine noise compress roughly like a photo.
+    width, height = size
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient("L").resize(size).rotate(rng.choice((0, 90, 180, 270)), expand=False)
+    coarse = Image.effect_noise((max(1, width // 8), max(1, height // 8)), 60).resize(size, Image.BILINEAR)
+    fine = Image.effect_noise(size, 12)
+    return Image.merge("RGB", (
+        Image.blend(gradient, coarse, 0.5),
+        Image.blend(coarse, fine, 0.3),
+        gradient.transpose(Image.FLIP_LEFT_RIGHT),
+    ))
+
+
+def _encode_base(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        # An EXIF block forces the extended (VP8X) container, which allows
+        # the unknown chunk used below to make every file unique.
+        exif = Image.Exif()
+        exif[0x010E] = "benchmark"
+        img.save(buf, format=fmt, exif=exif)
+    else:
+        img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _unique(data: bytes, fmt: str, token: bytes) -> bytes:
+    """Give every synthetic file distinct bytes without re-encoding it.
+
+    Identical files would let the content-hash cache short-circuit and make
+    the numbers meaningless.
+    """
+    if fmt == "JPEG":
+        return data[:2] + b"\xff\xfe" + struct.pack(">H", len(token) + 2) + token + data[2:]
+    if fmt == "PNG":
+        body = b"tEXt" + b"bench\x00" + token
+        chunk = struct.pack(">I", len(body) - 4) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+        return data[:33] + chunk + data[33:]
+    payload = token + (b"\x00" if len(token) % 2 else b"")
+    chunk = b"BNCH" + struct.pack("<I", len(token)) + payload
+    riff_size = struct.unpack("<I", data[4:8])[0] + len(chunk)
+    return data[:4] + struct.pack("<I", riff_size) + data[8:] + chunk
+
+
+def generate_tree(root: Path, photos: int, galleries: int, resolution: Tuple[int, int], formats: List[str]) -> List[str]:
+    """Write ``photos`` synthetic images spread over ``galleries`` folders."""
+    bases = {}
+    for ext in formats:
+        fmt = FORMATS[ext]
+        bases[ext] = [_encode_base(_base_image(resolution, seed), fmt) for seed in range(BASE_VARIANTS)]
+    estimate = sum(len(b[0]) for b in bases.values()) / len(bases) * photos
+    print(f"Generating {photos} image(s) in {galleries} galleries (~{estimate / 1e6:.0f} MB) under {root}")
+
+    names = [f"Gallery {i:05d}" for i in range(galleries)]
+    for name in names:
+        (root / name).mkdir(parents=True, exist_ok=True)
+    for i in range(photos):
+        ext = formats[i % len(formats)]
+        data = _unique(bases[ext][i % BASE_VARIANTS], FORMATS[ext], f"photo-{i}".encode())
+        (root / names[i % galleries] / f"IMG{i:06d}.{ext}").write_bytes(data)
+
+    # Pre-seed galleries.json so the legacy generator never stops to prompt.
+    with open(root / "galleries.json", "w", encoding="utf-8") as f:
+        json.dump({"galleries": [{"name": n, "title": n, "coverPhoto": ""} for n in names]}, f)
+    return names
+
+
+def tree_stats(root: Path) -> Tuple[int, int]:
+    files = 0
+    total = 0
+    for folder, _, names in os.walk(root):
+        for name in names:
+            if Path(name).suffix.lower() in gallery_wizard.IMAGE_EXTS:
+                files += 1
+                total += os.path.getsize(os.path.join(folder, name))
+    return files, total
+
+
+def _max_rss_bytes(who: int) -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def point_pipeline_at(workdir: Path) -> None:
+    """Redirect the pipeline's module-level paths to a synthetic tree."""
+    gallery_wizard.PUBLIC_IMAGES = workdir / "public" / "images"
+    derivatives.DERIVATIVES_ROOT = workdir / "public" / "derivatives"
+
+
+def _stage_child(func: Callable, args: Tuple, workdir: Path, queue) -> None:
+    # Re-applied here because spawn-based platforms re-import every module.
+    point_pipeline_at(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func(*args)
+        seconds = time.perf_counter() - start
+    peak = None
+    if resource is not None:
+        # Pool workers are reaped children, so they count towards the stage.
+        peak = max(_max_rss_bytes(resource.RUSAGE_SELF), _max_rss_bytes(resource.RUSAGE_CHILDREN))
+    queue.put((seconds, peak))
+
+
+def run_stage(name: str, func: Callable, args: Tuple, workdir: Path, files: int, size: int) -> Dict:
+    """Run one stage in a fresh process so its peak RSS is its own."""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_stage_child, args=(func, args, workdir, queue))
+    proc.start()
+    while True:
+        try:
+            seconds, peak = queue.get(timeout=1.0)
+            break
+        except queue_module.Empty:
+            # A child that raised has printed its traceback and will never report.
+            if not proc.is_alive():
+                proc.join()
+                raise SystemExit(f"Stage '{name}' failed (exit code {proc.exitcode}); see the error above.")
+    proc.join()
+    result = {
+        "stage": name,
+        "seconds": round(seconds, 4),
+        "files": files,
+        "bytes": size,
+        "files_per_s": round(files / seconds, 2) if seconds else None,
+        "mb_per_s": round(size / 1e6 / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(peak / 1e6, 1) if peak else None,
+    }
+    print(f"  {name:<28} {seconds:9.3f}s  {result['files_per_s'] or 0:>10} files/s  "
+          f"{result['mb_per_s'] or 0:>8} MB/s  peak {result['peak_rss_mb']} MB")
+    return result
+
+
+# Stage bodies: module-level so they can be handed to a child process.
+
+def _stage_already_resized(images: Path, names: List[str], cache_path: Path) -> None:
+    cache = BuildCache(cache_path)
+    for name in names:
+        gallery_wizard.already_resized(images / name, cache)
+    cache.save()
+
+
+def _stage_resize(images: Path, jobs: int, profile: str, max_memory: Optional[int]) -> None:
+    paths = [Path(folder) / n for folder, _, files in os.walk(images) for n in files
+             if Path(n).suffix.lower() in gallery_wizard.IMAGE_EXTS]
+    resize_files(paths, gallery_wizard.RESIZE_TARGET, jobs=jobs, desc="Resizing", profile=profile, max_memory=max_memory)
+
+
+def _stage_payload(registry: Dict, cache_path: Path) -> None:
+    cache = BuildCache(cache_path)
+    gallery_wizard.build_public_payload(registry, cache)
+    cache.save()
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    photos = SCALES.get(args.scale, 0) if args.photos is None else args.photos
+    galleries = max(1, args.galleries or photos // 100)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="gallery-bench-"))
+    images = workdir / "public" / "images"
+    cache_path = workdir / ".cache" / "build-cache.json"
+    point_pipeline_at(workdir)
+
+    names = generate_tree(images, photos, galleries, args.resolution, args.formats)
+    registry = {"galleries": [{"name": n, "folder": n, "title": n, "cover": ""} for n in names]}
+    stages = []
+    try:
+        files, size = tree_stats(images)
+        print(f"\nStages ({files} files, {size / 1e6:.0f} MB, {args.jobs} worker(s)):")
+        stages.append(run_stage("resize_images", _stage_resize, (images, args.jobs, args.encoder, args.max_memory), workdir, files, size))
+        # Measured on the resized tree: on oversized originals already_resized
+        # stops at the first large file and would time almost nothing.
+        files, size = tree_stats(images)
+        stages.append(run_stage("already_resized (cold)", _stage_already_resized, (images, names, cache_path), workdir, files, size))
+        stages.append(run_stage("already_resized (warm)", _stage_already_resized, (images, names, cache_path), workdir, files, size))
+        stages.append(run_stage("build_public_payload (cold)", _stage_payload, (registry, cache_path), workdir, files, size))
+        stages.append(run_stage("build_public_payload (warm)", _stage_payload, (registry, cache_path), workdir, files, size))
+        stages.append(run_stage("generate_manifest", generate_manifest, (str(images),), workdir, files, size))
+        stages.append(run_stage("generate_galleries_json", generate_galleries_json, (str(images),), workdir, files, size))
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "photos": photos,
+            "galleries": galleries,
+            "resolution": list(args.resolution),
+            "formats": args.formats,
+            "jobs": args.jobs,
+            "max_memory": args.max_memory,
+            "encoder": args.encoder,
+        },
+        "stages": stages,
+    }
+
+
+def compare(current: Dict, baseline_path: Path) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {s["stage"]: s for s in json.load(f).get("stages", [])}
+    print(f"\nCompared with {baseline_path}:")
+    for stage in current["stages"]:
+        before = baseline.get(stage["stage"])
+        if not before or not before["seconds"]:
+            print(f"  {stage['stage']:<28} (no baseline)")
+            continue
+        change = (stage["seconds"] - before["seconds"]) / before["seconds"] * 100
+        print(f"  {stage['stage']:<28} {before['seconds']:9.3f}s -> {stage['seconds']:9.3f}s  ({change:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Time the gallery pipeline against a synthetic photo tree.")
+    parser.add_argument("--scale", choices=list(SCALES), default="1k", help="preset photo count (default: 1k)")
+    parser.add_argument("--photos", type=int, help="exact photo count (overrides --scale)")
+    parser.add_argument("--galleries", type=int, help="number of galleries (default: photos / 100)")
+    parser.add_argument("--resolution", type=parse_resolution, default=(2400, 1600), help="synthetic image size, e.g. 6000x4000")
+    parser.add_argument("--formats", type=lambda v: v.split(","), default=["jpg", "png", "webp"], help="comma list of jpg,png,webp")
+    parser.add_argument("--jobs", type=int, default=default_jobs(), help="worker processes for resizing (default: CPU count)")
+    parser.add_argument("--encoder", default=DEFAULT_PROFILE, choices=sorted(PROFILES), help="encoder profile used by resize_images")
+    parser.add_argument("--max-memory", type=parse_memory, metavar="SIZE", help="memory budget passed to the resize stage, e.g. 2G")
+    parser.add_argument("--workdir", help="generate into this directory and keep it (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary synthetic tree")
+    parser.add_argument("--output", type=Path, help="results file (default: .cache/bench/<scale>-<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="previous results file to diff against")
+    args = parser.parse_args(argv)
+    unknown = [f for f in args.formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"unsupported format(s): {', '.join(unknown)}")
+
+    results = run_benchmark(args)
+    output = args.output or RESULTS_DIR / f"{args.photos or args.scale}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults: {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
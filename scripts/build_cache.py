@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Tuple
+
+from PIL import Image
+
+from normalize import needs_normalizing
+from perceptual import dhash
+from placeholders import blurhash
+
+ROOT = Path(__file__).resolve().parent.parent
+CACHE_PATH = ROOT / ".cache" / "build-cache.json"
+CACHE_VERSION = 2
+
+
+@dataclass
+class ImageInfo:
+    size: int
+    mtime_ns: int
+    sha256: str
+    width: int
+    height: int
+    format: str
+    # Upright, sRGB and free of metadata (see normalize.needs_normalizing).
+    normalized: bool = False
+    placeholder: str = ""
+    dhash: str = ""
+
+    def fits(self, target: Tuple[int, int]) -> bool:
+        """True when the image is already at or below the web size target."""
+        return self.width <= target[0] and self.height <= target[1]
+
+    def web_ready(self, target: Tuple[int, int]) -> bool:
+        """True when resizing would neither shrink nor normalize the image."""
+        return self.normalized and self.fits(target)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """On-disk image metadata cache keyed by path, size, mtime and content hash.
+
+    A file whose size and mtime are unchanged is answered from the cache
+    without being opened. If the stat changed but the bytes did not (a touch,
+    a copy, a rename) the hash still matches and the image is not decoded.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, rebuild: bool = False):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        if not rebuild:
+            self._load()
+        self._by_hash = {e["sha256"]: e for e in self.entries.values()}
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"Build cache at {self.path} is unreadable; starting fresh.")
+            return
+        if data.get("version") == CACHE_VERSION:
+            self.entries = data.get("files", {})
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(ROOT).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def is_current(self, path: Path) -> bool:
+        """True when ``path`` exists with the size and mtime recorded in the cache."""
+        cached = self.entries.get(self._key(path))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return bool(cached) and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns
+
+    def info(self, path: Path) -> ImageInfo:
+        """Return metadata for an image, reading the file only when it changed.
+
+        Raises OSError if the file is missing or cannot be decoded.
+        """
+        key = self._key(path)
+        st = os.stat(path)
+        cached = self.entries.get(key)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            self.hits += 1
+            return ImageInfo(**cached)
+
+        sha = file_sha256(path)
+        known = cached if cached and cached["sha256"] == sha else self._by_hash.get(sha)
+        if known:
+            self.hits += 1
+            info = ImageInfo(
+                st.st_size, st.st_mtime_ns, sha, known["width"], known["height"], known["format"],
+                known.get("normalized", False), known.get("placeholder", ""), known.get("dhash", ""),
+            )
+        else:
+            self.misses += 1
+            with Image.open(path) as img:
+                width, height = img.size
+                fmt = img.format or ""
+                normalized = not needs_normalizing(img)
+            info = ImageInfo(st.st_size, st.st_mtime_ns, sha, width, height, fmt, normalized)
+        self.entries[key] = asdict(info)
+        self._by_hash[sha] = self.entries[key]
+        self.dirty = True
+        return info
+
+    def placeholder(self, path: Path) -> str:
+        """BlurHash preview for an image, computed once and kept in the cache."""
+        info = self.info(path)
+        if info.placeholder:
+            return info.placeholder
+        with Image.open(path) as img:
+            info.placeholder = blurhash(img)
+        self.entries[self._key(path)]["placeholder"] = info.placeholder
+        self.dirty = True
+        return info.placeholder
+
+    def perceptual_hash(self, path: Path) -> str:
+        """Perceptual (difference) hash, computed once and kept in the cache."""
+        info = self.info(path)
+        if info.dhash:
+            return info.dhash
+        with Image.open(path) as img:
+            info.dhash = dhash(img)
+        self.entries[self._key(path)]["dhash"] = info.dhash
+        self.dirty = True
+        return info.dhash
+
+    def forget(self, path: Path) -> None:
+        if self.entries.pop(self._key(path), None) is not None:
+            self.dirty = True
+
+    def prune(self) -> None:
+        """Drop entries for files that no longer exist."""
+        stale = [k for k in self.entries if not (ROOT / k).exists() and not Path(k).exists()]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.prune()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": self.entries}, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,132 @@
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from build_cache import BuildCache
+from encoders import EncoderProfile, output_extension
+from resize_engine import ResizeResult, derive_one, run_batch
+
+ROOT = Path(__file__).resolve().parent.parent
+PUBLIC_ROOT = ROOT / "public"
+DERIVATIVES_ROOT = PUBLIC_ROOT / "derivatives"
+DEFAULT_WIDTHS = (640, 960, 1440, 1600)
+
+
+def gallery_widths(entry: Dict) -> List[int]:
+    """Widths configured for a registry entry (``widths:`` in galleries.yaml)."""
+    raw = entry.get("widths") or DEFAULT_WIDTHS
+    try:
+        widths = sorted({int(w) for w in raw if int(w) > 0})
+    except (TypeError, ValueError):
+        raise SystemExit(f"Gallery '{entry.get('name')}' has an invalid widths list: {raw!r}")
+    return widths or list(DEFAULT_WIDTHS)
+
+
+def derivative_name(file_name: str, profile: EncoderProfile) -> str:
+    return Path(file_name).stem + output_extension(profile, file_name)
+
+
+def derivative_path(gallery: str, width: int, file_name: str, profile: EncoderProfile) -> Path:
+    return DERIVATIVES_ROOT / gallery / str(width) / derivative_name(file_name, profile)
+
+
+def planned_widths(source_width: int, widths: List[int]) -> List[int]:
+    # Never upscale: the web-sized original already covers its own width.
+    return [w for w in widths if w < source_width]
+
+
+def available_variants(
+    gallery: str, file_name: str, source_width: int, widths: List[int], profile: EncoderProfile
+) -> List[int]:
+    return [
+        w for w in planned_widths(source_width, widths)
+        if derivative_path(gallery, w, file_name, profile).exists()
+    ]
+
+
+def _is_fresh(source: Path, dest: Path) -> bool:
+    try:
+        return dest.stat().st_mtime_ns >= source.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def plan_derivatives(
+    folder: Path,
+    gallery: str,
+    photos: List[str],
+    widths: List[int],
+    cache: BuildCache,
+    profile: EncoderProfile,
+) -> List[Tuple[str, List[Tuple[int, str]], str]]:
+    """List ``derive_one`` tasks for missing or stale variants in a gallery.
+
+    Variants for photos or widths that are no longer configured are removed.
+    Photos whose variants would share a file name (``a.jpg`` and ``a.png``
+    under an encoder that writes ``.webp``) stop the build.
+    """
+    names: Dict[str, List[str]] = {}
+    for file_name in photos:
+        names.setdefault(derivative_name(file_name, profile), []).append(file_name)
+    clashes = [files for files in names.values() if len(files) > 1]
+    if clashes:
+        listed = "; ".join(" and ".join(files) for files in clashes)
+        raise SystemExit(f"Gallery '{gallery}' has photos whose variants would overwrite each other: {listed}. Rename one of each.")
+
+    tasks: List[Tuple[str, List[Tuple[int, str]], str]] = []
+    for file_name in photos:
+        source = folder / file_name
+        try:
+            source_width = cache.info(source).width
+        except OSError as exc:
+            print(f"Skipping derivatives for {source}: {exc}")
+            continue
+        targets = [
+            (w, str(derivative_path(gallery, w, file_name, profile)))
+            for w in planned_widths(source_width, widths)
+            if not _is_fresh(source, derivative_path(gallery, w, file_name, profile))
+        ]
+        if targets:
+            tasks.append((str(source), targets, profile.name))
+
+    prune_derivatives(gallery, photos, widths, profile)
+    return tasks
+
+
+def generate_derivatives(
+    folder: Path,
+    gallery: str,
+    photos: List[str],
+    widths: List[int],
+    cache: BuildCache,
+    profile: EncoderProfile,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+) -> List[ResizeResult]:
+    """Create missing or stale width variants for every photo in a gallery."""
+    tasks = plan_derivatives(folder, gallery, photos, widths, cache, profile)
+    if not tasks:
+        return []
+    return run_batch(derive_one, tasks, jobs=jobs, desc="Derivatives", max_memory=max_memory)
+
+
+def prune_derivatives(gallery: str, photos: List[str], widths: List[int], profile: EncoderProfile) -> None:
+    """Remove variants for photos or widths that are no longer configured."""
+    gallery_dir = DERIVATIVES_ROOT / gallery
+    if not gallery_dir.exists():
+        return
+    keep_widths = {str(w) for w in widths}
+    keep_files = {derivative_name(f, profile) for f in photos}
+    with os.scandir(gallery_dir) as it:
+        for width_dir in it:
+            if not width_dir.is_dir():
+                os.remove(width_dir.path)
+                continue
+            if width_dir.name not in keep_widths:
+                shutil.rmtree(width_dir.path)
+                continue
+            with os.scandir(width_dir.path) as files:
+                for f in files:
+                    if f.name not in keep_files:
+                        os.remove(f.path)
@@ -0,0 +1,237 @@
+import io
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageMath
+
+try:  # AVIF needs Pillow built with libavif or the pillow-avif-plugin package.
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# Byte budgets are stated for a full web-sized image; smaller outputs get a
+# budget scaled down by pixel count.
+REFERENCE_PIXELS = 1600 * 1200
+SIMILARITY_SIDE = 384
+BLOCK = 8
+C1 = (0.01 * 255) ** 2
+C2 = (0.03 * 255) ** 2
+# The quality search brackets its answer from the previous one and gives up
+# after this many encodes, so a photo far from the last one may land a few
+# quality steps higher than strictly needed.
+MAX_SEARCH_ENCODES = 4
+SEARCH_STEP = 4
+# Quality last chosen per profile in this process (one per pool worker).
+_last_quality: Dict[str, int] = {}
+# ImageMath.eval was renamed unsafe_eval in Pillow 10.3.
+_math = getattr(ImageMath, "unsafe_eval", None) or ImageMath.eval
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    name: str
+    format: Optional[str]  # None keeps the source format with Pillow defaults
+    extension: Optional[str] = None
+    options: Dict = field(default_factory=dict)
+    min_quality: int = 40
+    max_quality: int = 90
+    byte_budget: Optional[int] = None
+    min_similarity: Optional[float] = None
+
+    @property
+    def searches(self) -> bool:
+        return self.format is not None and bool(self.byte_budget or self.min_similarity)
+
+
+PROFILES: Dict[str, EncoderProfile] = {
+    p.name: p
+    for p in (
+        EncoderProfile("original", None),
+        EncoderProfile(
+            "web-jpeg-progressive",
+            "JPEG",
+            ".jpg",
+            {"progressive": True, "optimize": True},
+            min_quality=50,
+            max_quality=92,
+            byte_budget=450_000,
+            min_similarity=0.99,
+        ),
+        EncoderProfile(
+            "webp",
+            "WEBP",
+            ".webp",
+            {"method": 4},
+            min_quality=40,
+            max_quality=90,
+            byte_budget=300_000,
+            min_similarity=0.97,
+        ),
+        EncoderProfile(
+            "avif",
+            "AVIF",
+            ".avif",
+            {"speed": 6},
+            min_quality=35,
+            max_quality=85,
+            byte_budget=250_000,
+            min_similarity=0.965,
+        ),
+    )
+}
+DEFAULT_PROFILE = "web-jpeg-progressive"
+
+
+def get_profile(name: Optional[str], check_support: bool = True) -> EncoderProfile:
+    profile = PROFILES.get(name or DEFAULT_PROFILE)
+    if profile is None:
+        raise SystemExit(f"Unknown encoder profile '{name}'. Choose one of: {', '.join(PROFILES)}.")
+    if check_support and profile.format:
+        Image.init()
+        if profile.format not in Image.SAVE:
+            raise SystemExit(
+                f"Encoder profile '{profile.name}' needs {profile.format} support in Pillow "
+                f"(for AVIF install pillow-avif-plugin)."
+            )
+    return profile
+
+
+def profile_for_source(profile: EncoderProfile, source_format: Optional[str]) -> EncoderProfile:
+    """Profile used when rewriting a source file in place, keeping its container.
+
+    Files under public/images keep their names, so a WebP/AVIF gallery still
+    rewrites its JPEG sources as JPEG.
+    """
+    if profile.format is None or profile.format == source_format:
+        return profile
+    if source_format == "JPEG":
+        return PROFILES["web-jpeg-progressive"]
+    return PROFILES["original"]
+
+
+def output_extension(profile: EncoderProfile, source_name: str) -> str:
+    if profile.extension:
+        return profile.extension
+    return "." + source_name.rsplit(".", 1)[-1] if "." in source_name else ""
+
+
+def _prepare(img: Image.Image, fmt: str) -> Image.Image:
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        return img.convert("RGB")
+    if img.mode == "P":
+        return img.convert("RGBA")
+    return img
+
+
+def encode(img: Image.Image, profile: EncoderProfile, quality: Optional[int], source_format: Optional[str] = None) -> bytes:
+    buf = io.BytesIO()
+    if profile.format is None:
+        img.save(buf, format=source_format or img.format)
+    else:
+        options = dict(profile.options)
+        if quality is not None:
+            options["quality"] = quality
+        _prepare(img, profile.format).save(buf, format=profile.format, **options)
+    return buf.getvalue()
+
+
+def _luma(img: Image.Image) -> Image.Image:
+    # Compression artifacts vanish when downscaled, so compare a centre crop
+    # at native resolution rather than a thumbnail. Trimmed to whole 8x8 blocks.
+    luma = img.convert("L")
+    w = min(SIMILARITY_SIDE, luma.width) // BLOCK * BLOCK or luma.width
+    h = min(SIMILARITY_SIDE, luma.height) // BLOCK * BLOCK or luma.height
+    left = (luma.width - w) // 2
+    top = (luma.height - h) // 2
+    return luma.crop((left, top, left + w, top + h)).convert("F")
+
+
+def _block_means(img: Image.Image) -> Image.Image:
+    # A BOX resize by a whole factor is the exact mean of each block.
+    return img.resize((max(1, img.width // BLOCK), max(1, img.height // BLOCK)), Image.BOX)
+
+
+def similarity(reference: Image.Image, candidate: Image.Image) -> float:
+    """Mean SSIM over 8x8 luma blocks of two same-sized ``_luma`` crops.
+
+    Block statistics come from Pillow image arithmetic rather than Python
+    loops, so one comparison costs a few milliseconds.
+    """
+    x, y = reference, candidate
+    mx, my = _block_means(x), _block_means(y)
+    exx = _block_means(_math("a * a", a=x))
+    eyy = _block_means(_math("b * b", b=y))
+    exy = _block_means(_math("a * b", a=x, b=y))
+    n = BLOCK * BLOCK
+    ssim = _math(
+        f"((2 * mx * my + {C1}) * (2 * (exy - mx * my) * {n / (n - 1)} + {C2}))"
+        f" / ((mx * mx + my * my + {C1}) * ((exx - mx * mx + eyy - my * my) * {n / (n - 1)} + {C2}))",
+        mx=mx, my=my, exx=exx, eyy=eyy, exy=exy,
+    )
+    values = list(ssim.getdata())
+    return sum(values) / len(values) if values else 1.0
+
+
+def _start_quality(profile: EncoderProfile) -> int:
+    quality = _last_quality.get(profile.name, (profile.min_quality + profile.max_quality) // 2)
+    return max(profile.min_quality, min(profile.max_quality, quality))
+
+
+def encode_best(img: Image.Image, profile: EncoderProfile, source_format: Optional[str] = None) -> Tuple[bytes, Optional[int]]:
+    """Encode ``img`` at the lowest quality that satisfies the profile.
+
+    The answer is the lowest quality that meets the similarity floor, but
+    never above the highest quality whose output fits the byte budget (the
+    budget wins when both cannot hold). Quality and both limits move
+    together, so one threshold is searched for: starting from the quality
+    this worker last chose for the profile (photos from one shoot land close
+    together), it steps outward until the threshold is bracketed, then
+    bisects, stopping after ``MAX_SEARCH_ENCODES`` encodes. Returns the
+    encoded bytes and the quality used.
+    """
+    if not profile.searches:
+        quality = profile.max_quality if profile.format else None
+        return encode(img, profile, quality, source_format), quality
+
+    attempts: Dict[int, bytes] = {}
+
+    def attempt(q: int) -> bytes:
+        if q not in attempts:
+            attempts[q] = encode(img, profile, q, source_format)
+        return attempts[q]
+
+    budget = profile.byte_budget * min(1.0, img.width * img.height / REFERENCE_PIXELS) if profile.byte_budget else None
+    reference = _luma(img) if profile.min_similarity else None
+
+    def high_enough(q: int) -> bool:
+        # True once q is over the budget or already looks close enough to the source.
+        data = attempt(q)
+        if budget is not None and len(data) > budget:
+            return True
+        if reference is None:
+            return False
+        with Image.open(io.BytesIO(data)) as decoded:
+            return similarity(reference, _luma(decoded)) >= profile.min_similarity
+
+    # failing < threshold <= passing; the outer values are never encoded.
+    failing, passing = profile.min_quality - 1, profile.max_quality + 1
+    q, step = _start_quality(profile), SEARCH_STEP
+    for _ in range(MAX_SEARCH_ENCODES):
+        if high_enough(q):
+            passing = q
+        else:
+            failing = q
+        if passing - failing <= 1:
+            break
+        if failing >= profile.min_quality and passing <= profile.max_quality:
+            q = (failing + passing) // 2
+        elif passing <= profile.max_quality:
+            q, step = max(failing + 1, passing - step), step * 2
+        else:
+            q, step = min(passing - 1, failing + step), step * 2
+
+    chosen = min(passing, profile.max_quality)
+    if budget is not None and len(attempt(chosen)) > budget:
+        chosen = max(failing, profile.min_quality)
+    _last_quality[profile.name] = chosen
+    return attempt(chosen), chosen
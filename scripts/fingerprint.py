@@ -0,0 +1,263 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from optimize import BUDGETS_PATH, MINIFIERS, check_budgets, load_budgets, minify_bytes, minify_html, precompress
+
+# Stdlib only (brotli optional): this stage also runs in CI right before deploying dist/.
+ROOT = Path(__file__).resolve().parent.parent
+PUBLIC_DIR = ROOT / "public"
+DIST_DIR = ROOT / "dist"
+MANIFEST_NAME = "asset-manifest.json"
+INDEX_JSON = "images/galleries.json"
+# Per-gallery photo lists the client falls back to when the index has no shards.
+PHOTO_MANIFEST = "manifest.json"
+SHARDS_PREFIX = "galleries/"
+# Already named by a hash of their inputs; copied as-is so the index needs no rewrite.
+SPRITES_PREFIX = "sprites/"
+# Never deployed: the retired global passcode file, should a stale copy reappear.
+IGNORED_FILES = {"secrets.json"}
+HASH_LENGTH = 10
+# Everything firebase.json serves as immutable gets a content-hashed name.
+FINGERPRINT_EXTS = {".jpg", ".jpeg", ".gif", ".png", ".webp", ".avif", ".svg", ".ico", ".css", ".js"}
+HTML_REF = re.compile(r'(\b(?:src|href)=")([^"#?]+)(")')
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(logical: str, digest: str) -> str:
+    stem, dot, ext = logical.rpartition(".")
+    if not dot or "/" in ext:
+        return f"{logical}.{digest}"
+    return f"{stem}.{digest}.{ext}"
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def write_minified(src: Path, dst: Path, data: Optional[bytes] = None) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.write_bytes(data if data is not None else minify_bytes(src.read_bytes(), src.suffix))
+
+
+def _public_files(public_dir: Path) -> List[Path]:
+    files = []
+    for root, dirs, names in os.walk(public_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        files.extend(Path(root) / n for n in sorted(names) if not n.startswith("."))
+    return files
+
+
+def _basename(manifest: Dict[str, str], logical: str, fallback: str) -> str:
+    hashed = manifest.get(logical)
+    return hashed.rsplit("/", 1)[-1] if hashed else fallback
+
+
+def rewrite_photo(photo, gallery: Dict, manifest: Dict[str, str]):
+    if isinstance(photo, str):
+        return _basename(manifest, f"images/{gallery['name']}/{photo}", photo)
+    photo = dict(photo)
+    file_name = photo["file"]
+    photo["file"] = _basename(manifest, f"images/{gallery['name']}/{file_name}", file_name)
+    variant_ext = gallery.get("variantExt")
+    variant_name = (Path(file_name).stem + variant_ext) if variant_ext else file_name
+    variant_files = {}
+    for width in photo.get("variants", []):
+        logical = f"derivatives/{gallery['name']}/{width}/{variant_name}"
+        if logical in manifest:
+            variant_files[str(width)] = _basename(manifest, logical, variant_name)
+    if variant_files:
+        photo["variantFiles"] = variant_files
+    return photo
+
+
+def rewrite_payload(index: Dict, public_dir: Path, dist_dir: Path, manifest: Dict[str, str]) -> Dict:
+    """Point the homepage index and its shards at fingerprinted files.
+
+    Shards are content-addressed too, so rewriting one gives it a new name.
+    """
+    index = json.loads(json.dumps(index))
+    for gallery in index.get("galleries", []):
+        name = gallery.get("name", "")
+        if gallery.get("coverPhoto"):
+            gallery["coverPhoto"] = _basename(manifest, f"images/{name}/{gallery['coverPhoto']}", gallery["coverPhoto"])
+        if gallery.get("cover"):
+            gallery["cover"] = rewrite_photo(gallery["cover"], gallery, manifest)
+        if gallery.get("photos"):
+            gallery["photos"] = [rewrite_photo(p, gallery, manifest) for p in gallery["photos"]]
+
+        shard_ref = gallery.get("shard", "")
+        shard_path = public_dir / shard_ref
+        if not shard_ref or not shard_path.is_file():
+            continue
+        with open(shard_path, "r", encoding="utf-8") as f:
+            shard = json.load(f)
+        shard["photos"] = [rewrite_photo(p, gallery, manifest) for p in shard.get("photos", [])]
+        data = json.dumps(shard, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        slug = Path(shard_ref).name.split(".", 1)[0]
+        new_ref = f"{SHARDS_PREFIX}{slug}.{content_hash(data)}.json"
+        (dist_dir / new_ref).parent.mkdir(parents=True, exist_ok=True)
+        (dist_dir / new_ref).write_bytes(data)
+        manifest[shard_ref] = new_ref
+        gallery["shard"] = new_ref
+    return index
+
+
+def rewrite_manifest(rel: str, data, manifest: Dict[str, str]):
+    """Point an ``images/<gallery>/manifest.json`` photo list at fingerprinted files.
+
+    Accepts the plain list ``manifest_generator`` writes or an object with
+    an ``images`` list; names with no fingerprinted file are kept.
+    """
+    folder = rel.rsplit("/", 1)[0]
+
+    def swap(name):
+        return _basename(manifest, f"{folder}/{name}", name) if isinstance(name, str) else name
+
+    if isinstance(data, list):
+        return [swap(name) for name in data]
+    if isinstance(data, dict) and isinstance(data.get("images"), list):
+        return {**data, "images": [swap(name) for name in data["images"]]}
+    return data
+
+
+def _is_photo_manifest(rel: str) -> bool:
+    return rel.startswith("images/") and rel.endswith("/" + PHOTO_MANIFEST)
+
+
+def rewrite_html(text: str, manifest: Dict[str, str]) -> str:
+    def swap(match: "re.Match") -> str:
+        ref = match.group(2)
+        if "://" in ref or ref.startswith("//") or ref.startswith("data:"):
+            return match.group(0)
+        prefix = "/" if ref.startswith("/") else ""
+        hashed = manifest.get(ref.lstrip("/").removeprefix("./"))
+        return f"{match.group(1)}{prefix}{hashed}{match.group(3)}" if hashed else match.group(0)
+
+    return HTML_REF.sub(swap, text)
+
+
+def build(public_dir: Path = PUBLIC_DIR, dist_dir: Path = DIST_DIR) -> Dict[str, str]:
+    """Copy public/ into dist/ with content-hashed asset names.
+
+    Images are hard-linked where possible, so dist/ costs almost no disk.
+    Text assets (JS, CSS, HTML, JSON) are minified first, so hashes match
+    the bytes actually served. Returns the logical-name -> hashed-name manifest.
+    """
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+    dist_dir.mkdir(parents=True)
+
+    manifest: Dict[str, str] = {}
+    deferred: List[Path] = []
+    for path in _public_files(public_dir):
+        rel = path.relative_to(public_dir).as_posix()
+        ext = path.suffix.lower()
+        if path.name in IGNORED_FILES:
+            print(f"Not deploying {rel}.")
+        elif rel.startswith(SPRITES_PREFIX):
+            link_or_copy(path, dist_dir / rel)
+        elif ext in FINGERPRINT_EXTS and ext in MINIFIERS:
+            data = minify_bytes(path.read_bytes(), ext)
+            manifest[rel] = hashed_name(rel, content_hash(data))
+            write_minified(path, dist_dir / manifest[rel], data)
+        elif ext in FINGERPRINT_EXTS:
+            manifest[rel] = hashed_name(rel, file_hash(path))
+            link_or_copy(path, dist_dir / manifest[rel])
+        elif ext == ".html" or rel == INDEX_JSON or rel.startswith(SHARDS_PREFIX) or _is_photo_manifest(rel):
+            deferred.append(path)
+        elif ext in MINIFIERS:
+            write_minified(path, dist_dir / rel)
+        else:
+            link_or_copy(path, dist_dir / rel)
+
+    index_path = public_dir / INDEX_JSON
+    if index_path.exists():
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if "accessSalt" not in index:
+            # Without the salt no gallery can be unlocked (the client has no other way in).
+            raise SystemExit(
+                f"{index_path} predates per-gallery access files; run `python scripts/gallery_wizard.py build --all` "
+                "and commit public/images/galleries.json, public/galleries and public/access."
+            )
+        index = rewrite_payload(index, public_dir, dist_dir, manifest)
+        (dist_dir / INDEX_JSON).parent.mkdir(parents=True, exist_ok=True)
+        with open(dist_dir / INDEX_JSON, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"), ensure_ascii=False)
+
+    for path in deferred:
+        rel = path.relative_to(public_dir).as_posix()
+        if path.suffix.lower() == ".html":
+            text = minify_html(rewrite_html(path.read_text(encoding="utf-8"), manifest))
+            (dist_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (dist_dir / rel).write_text(text, encoding="utf-8")
+        elif _is_photo_manifest(rel):
+            with open(path, "r", encoding="utf-8") as f:
+                photos = rewrite_manifest(rel, json.load(f), manifest)
+            (dist_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            with open(dist_dir / rel, "w", encoding="utf-8") as f:
+                json.dump(photos, f, separators=(",", ":"), ensure_ascii=False)
+        elif rel.startswith(SHARDS_PREFIX) and rel not in manifest:
+            # A shard no gallery points at; ship it as-is (shards are already compact).
+            link_or_copy(path, dist_dir / rel)
+
+    with open(dist_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(manifest.items())), f, separators=(",", ":"), ensure_ascii=False)
+    return manifest
+
+
+def finalize(dist_dir: Path, manifest: Dict[str, str], budgets: List[Dict]) -> List[str]:
+    """Precompress dist/ text files and check them against the size budgets.
+
+    Budgets use logical (pre-hash) paths, e.g. ``app.js`` or ``galleries/*.json``.
+    Returns the budget failures.
+    """
+    sizes = precompress(_public_files(dist_dir))
+    logical = {hashed: name for name, hashed in manifest.items()}
+    by_name = {}
+    for path, entry in sizes.items():
+        rel = path.relative_to(dist_dir).as_posix()
+        by_name[logical.get(rel, rel)] = entry
+    return check_budgets(by_name, budgets)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build dist/ from public/ with content-hashed asset names.")
+    parser.add_argument("--public", type=Path, default=PUBLIC_DIR, help="source directory (default: public/)")
+    parser.add_argument("--out", type=Path, default=DIST_DIR, help="output directory (default: dist/)")
+    parser.add_argument("--budgets", type=Path, default=BUDGETS_PATH, help="size budgets file (default: data/budgets.json)")
+    args = parser.parse_args(argv)
+    manifest = build(args.public, args.out)
+    print(f"Fingerprinted {len(manifest)} asset(s) into {args.out}")
+    print(f"Manifest: {args.out / MANIFEST_NAME}")
+    failures = finalize(args.out, manifest, load_budgets(args.budgets))
+    if failures:
+        print(f"\n{len(failures)} file(s) over budget:")
+        for failure in failures:
+            print(f" - {failure}")
+        raise SystemExit(f"Size budget exceeded; trim the files above or raise the limits in {args.budgets}.")
+
+
+if __name__ == "__main__":
+    main()
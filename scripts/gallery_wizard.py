@@ -1,24 +1,54 @@
+import argparse
+import hashlib
 import json
 import os
+import re
+import secrets
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import yaml
-from PIL import Image
-from tqdm import tqdm
+
+import instrumentation
+from archives import ARCHIVES_DIR, archive_path, is_current, originals_folder, package_one, read_checksum, relative_to_root
+from build_cache import BuildCache
+from derivatives import available_variants, gallery_widths, generate_derivatives, plan_derivatives
+from encoders import DEFAULT_PROFILE, PROFILES, EncoderProfile, get_profile
+from fingerprint import content_hash
+from perceptual import NEAR_DISTANCE, clusters
+from resize_engine import (
+    default_jobs,
+    derive_one,
+    format_bytes,
+    parse_memory,
+    report_errors,
+    report_savings,
+    resize_files,
+    resize_one,
+    run_batch,
+)
+from sprites import write_cover_sprites
+from staging import Journal, atomic_write_bytes, atomic_write_text
+from watcher import collect, make_watcher
 
 ROOT = Path(__file__).resolve().parent.parent
 REGISTRY_PATH = ROOT / "data" / "galleries.yaml"
 PUBLIC_IMAGES = ROOT / "public" / "images"
 OUTPUT_JSON = PUBLIC_IMAGES / "galleries.json"
-SECRETS_JSON = ROOT / "public" / "secrets.json"
+# Written by older builds; removed on the next build now that access files replace it.
+LEGACY_SECRETS_JSON = ROOT / "public" / "secrets.json"
+SHARDS_DIR = ROOT / "public" / "galleries"
+ACCESS_DIR = ROOT / "public" / "access"
+ACCESS_KEY_LENGTH = 32
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
 RESIZE_TARGET = (1600, 1200)
-ResamplingAttr = getattr(Image, "Resampling", None)
-if ResamplingAttr:
-    RESAMPLE: Any = getattr(ResamplingAttr, "LANCZOS", getattr(ResamplingAttr, "BICUBIC", getattr(ResamplingAttr, "NEAREST", 1)))
-else:
-    RESAMPLE: Any = getattr(Image, "LANCZOS", getattr(Image, "BICUBIC", getattr(Image, "NEAREST", 1)))
+# `exclude_duplicates: true` drops only near-identical copies (re-exports,
+# re-encodes); give a number in the registry to widen it.
+EXCLUDE_DISTANCE = 2
+REEXPORT_SUFFIX = re.compile(r"-\d+$")
+# Optional registry keys the wizard does not prompt for but must not drop.
+PRESERVED_KEYS = ("widths", "exclude_duplicates", "originals", "archive", "archive_sha256")
 
 
 def load_registry() -> Dict:
@@ -32,8 +62,7 @@ def load_registry() -> Dict:
 
 def save_registry(data: Dict) -> None:
     REGISTRY_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(REGISTRY_PATH, "w", encoding="utf-8") as f:
-        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=False)
+    atomic_write_text(REGISTRY_PATH, yaml.safe_dump(data, sort_keys=False, allow_unicode=False))
 
 def validate_gallery_name(name: str) -> str:
     cleaned = name.strip()
@@ -119,38 +148,53 @@ def ensure_folder(folder_name: str) -> Path:
 
 
 def find_images(folder: Path) -> List[str]:
-    photos = [f for f in os.listdir(folder) if Path(f).suffix.lower() in IMAGE_EXTS]
+    with instrumentation.stage("list", folder.name):
+        photos = [f for f in os.listdir(folder) if Path(f).suffix.lower() in IMAGE_EXTS]
     photos.sort()
     return photos
 
 
-def already_resized(folder: Path) -> bool:
+def already_resized(folder: Path, cache: Optional[BuildCache] = None) -> bool:
     photos = find_images(folder)
     if not photos:
         return False
-    for file_name in photos:
-        file_path = folder / file_name
-        try:
-            with Image.open(file_path) as img:
-                w, h = img.size
-                if w > RESIZE_TARGET[0] or h > RESIZE_TARGET[1]:
+    cache = cache or BuildCache()
+    with instrumentation.stage("scan", folder.name):
+        for file_name in photos:
+            file_path = folder / file_name
+            try:
+                if not cache.info(file_path).web_ready(RESIZE_TARGET):
                     return False
-        except OSError:
-            return False
+            except OSError:
+                return False
     return True
 
 
-def resize_images(folder: Path) -> None:
+def resize_images(
+    folder: Path,
+    jobs: Optional[int] = None,
+    profile: Optional[EncoderProfile] = None,
+    max_memory: Optional[int] = None,
+    resume: bool = False,
+) -> None:
     photos = find_images(folder)
     if not photos:
         print("No images to resize.")
         return
-    print("\nResizing images for the web (this overwrites the files in this folder).")
-    for file_name in tqdm(photos, desc="Resizing", unit="file"):
-        file_path = folder / file_name
-        with Image.open(file_path) as img:
-            img.thumbnail(RESIZE_TARGET, RESAMPLE)
-            img.save(file_path)
+    profile = profile or get_profile(DEFAULT_PROFILE)
+    print(f"\nResizing images for the web with '{profile.name}' (this overwrites the files in this folder).")
+    with instrumentation.stage("resize", folder.name):
+        results = resize_files(
+            (folder / f for f in photos),
+            RESIZE_TARGET,
+            jobs=jobs,
+            profile=profile.name,
+            max_memory=max_memory,
+            journal=Journal(f"resize-{gallery_slug(folder.name)}", resume),
+        )
+    instrumentation.record_results("resize", folder.name, results)
+    report_errors(results)
+    report_savings(f"{folder.name} (resize)", results)
 
 
 def choose_cover(photos: List[str], current_cover: str) -> str:
@@ -162,7 +206,14 @@ def choose_cover(photos: List[str], current_cover: str) -> str:
     return photos[0]
 
 
-def update_entry(entry: Dict) -> Dict:
+def update_entry(
+    entry: Dict,
+    jobs: Optional[int] = None,
+    cache: Optional[BuildCache] = None,
+    max_memory: Optional[int] = None,
+    resume: bool = False,
+) -> Dict:
+    cache = cache or BuildCache()
     single_name = prompt(
         "Gallery name (used for display, title, and folder under public/images)",
         entry.get("name", ""),
@@ -171,21 +222,32 @@ def update_entry(entry: Dict) -> Dict:
     name = validated_name
     folder = validated_name
     title = validated_name
+    encoder = prompt(
+        f"Encoder profile ({', '.join(PROFILES)})",
+        entry.get("encoder") or DEFAULT_PROFILE,
+    )
+    profile = get_profile(encoder)
 
     folder_path = ensure_folder(folder)
     photos = find_images(folder_path)
     if not photos:
         raise SystemExit(f"Folder '{folder_path}' has no images. Add photos before running the wizard.")
 
-    if already_resized(folder_path):
-        print("Images are already at or below the web size target; skipping resize.")
+    if already_resized(folder_path, cache):
+        print("Images are already normalized and at or below the web size target; skipping resize.")
     else:
         if confirm("Resize images for web? This overwrites the files in this folder."):
-            resize_images(folder_path)
+            resize_images(folder_path, jobs, profile, max_memory, resume)
             photos = find_images(folder_path)
         else:
             print("Skipped resizing. If images are large, the site may load slowly.")
 
+    with instrumentation.stage("derivatives", name):
+        derived = generate_derivatives(folder_path, name, photos, gallery_widths(entry), cache, profile, jobs, max_memory)
+    instrumentation.record_results("derivatives", name, derived)
+    report_errors(derived)
+    report_savings(f"{name} (derivatives vs. full size)", derived)
+
     existing_cover = entry.get("cover", "")
     if existing_cover:
         if existing_cover in photos:
@@ -195,17 +257,22 @@ def update_entry(entry: Dict) -> Dict:
             cover = choose_cover(photos, "")
     else:
         cover = choose_cover(photos, "")
-    password = prompt("Passcode (visible to users)", entry.get("password", ""))
-    download_link = prompt("Download link (public)", entry.get("download_link", ""))
+    password = prompt("Passcode", entry.get("password", ""))
+    download_link = prompt("Download link (shown after unlocking)", entry.get("download_link", ""))
 
-    return {
+    updated = {
         "name": name or folder,
         "folder": folder or name,
         "title": title or name or folder,
         "cover": cover,
         "password": password,
         "download_link": download_link,
+        "encoder": profile.name,
     }
+    for key in PRESERVED_KEYS:
+        if entry.get(key):
+            updated[key] = entry[key]
+    return updated
 
 
 def persist_entry(registry: Dict, updated: Dict) -> None:
@@ -218,41 +285,604 @@ def persist_entry(registry: Dict, updated: Dict) -> None:
     registry["galleries"] = sorted(registry["galleries"], key=lambda g: g.get("title", g.get("name", "")))
 
 
-def build_public_payload(registry: Dict) -> Dict:
+def describe_photo(
+    gallery: str, folder: Path, file_name: str, widths: List[int], profile: EncoderProfile, cache: BuildCache
+) -> Dict:
+    photo = {"file": file_name}
+    try:
+        info = cache.info(folder / file_name)
+        placeholder = cache.placeholder(folder / file_name)
+    except OSError as exc:
+        print(f"Could not read {folder / file_name}: {exc}")
+        return photo
+    photo["width"] = info.width
+    photo["height"] = info.height
+    photo["aspect"] = round(info.width / info.height, 4) if info.height else 0
+    photo["placeholder"] = placeholder
+    photo["variants"] = available_variants(gallery, file_name, info.width, widths, profile)
+    return photo
+
+
+def photo_hashes(galleries: List[Tuple[str, Path, List[str]]], cache: BuildCache) -> Dict[Tuple[str, str], int]:
+    """Perceptual hash per ``(gallery, file)``; unreadable files are left out."""
+    hashes = {}
+    for name, folder, photos in galleries:
+        with instrumentation.stage("hash", name):
+            for file_name in photos:
+                try:
+                    hashes[(name, file_name)] = int(cache.perceptual_hash(folder / file_name), 16)
+                except OSError as exc:
+                    print(f"Could not hash {folder / file_name}: {exc}")
+    return hashes
+
+
+def exclusion_distance(entry: Dict) -> Optional[int]:
+    value = entry.get("exclude_duplicates")
+    if isinstance(value, bool):
+        return EXCLUDE_DISTANCE if value else None
+    if isinstance(value, int) and value >= 0:
+        return value
+    return None
+
+
+def duplicate_exclusions(
+    gallery: str, folder: Path, photos: List[str], cover: str, distance: int, cache: BuildCache
+) -> List[str]:
+    """Photos to leave out of a gallery: all but one of each duplicate cluster.
+
+    The cover always survives; otherwise a name without a ``-2``-style
+    re-export suffix wins, then the larger file, then the first by name.
+    """
+    def keep_rank(file_name: str):
+        info = cache.info(folder / file_name)
+        reexport = bool(REEXPORT_SUFFIX.search(Path(file_name).stem))
+        return (file_name != cover, reexport, -(info.width * info.height), file_name)
+
+    excluded = []
+    for group in clusters(photo_hashes([(gallery, folder, photos)], cache), distance):
+        keep = min((f for _, f in group), key=keep_rank)
+        excluded.extend(f for _, f in group if f != keep)
+    return sorted(excluded)
+
+
+def find_duplicates(entries: List[Dict], cache: BuildCache, distance: int = NEAR_DISTANCE) -> List[Dict]:
+    """Duplicate clusters within and across the given galleries."""
+    galleries = []
+    for entry in entries:
+        folder = PUBLIC_IMAGES / entry.get("folder", entry.get("name", ""))
+        if folder.is_dir():
+            galleries.append((entry.get("name", ""), folder, find_images(folder)))
+    folders = {name: folder for name, folder, _ in galleries}
+    report = []
+    for group in clusters(photo_hashes(galleries, cache), distance):
+        digests = {cache.info(folders[g] / f).sha256 for g, f in group}
+        report.append({
+            "galleries": sorted({g for g, _ in group}),
+            "photos": [f"{g}/{f}" for g, f in group],
+            "exact": len(digests) == 1,
+        })
+    return report
+
+
+def print_duplicates(report: List[Dict], distance: int) -> None:
+    if not report:
+        print(f"No duplicates found (distance <= {distance}).")
+        return
+    within = [c for c in report if len(c["galleries"]) == 1]
+    across = [c for c in report if len(c["galleries"]) > 1]
+    for label, group in (("within a gallery", within), ("across galleries", across)):
+        if not group:
+            continue
+        print(f"\n{len(group)} duplicate cluster(s) {label}:")
+        for cluster in group:
+            kind = "identical" if cluster["exact"] else "near"
+            print(f" - [{kind}] {', '.join(cluster['photos'])}")
+    print(f"\nSet `exclude_duplicates: true` on a gallery in {REGISTRY_PATH.name} to drop its copies from the site.")
+
+
+def build_public_payload(registry: Dict, cache: Optional[BuildCache] = None) -> Dict:
+    cache = cache or BuildCache()
     payload = {"galleries": []}
     for entry in registry["galleries"]:
         folder_path = PUBLIC_IMAGES / entry.get("folder", entry.get("name", ""))
-        photos = find_images(folder_path) if folder_path.exists() else []
-        cover = entry.get("cover") or (photos[0] if photos else "")
-        if cover and cover not in photos:
+        names = find_images(folder_path) if folder_path.exists() else []
+        if not names:
+            print(f"Leaving '{entry.get('name')}' out of the site: no images in {folder_path}.")
+            continue
+        cover = entry.get("cover") or names[0]
+        if cover not in names:
             print(f"Cover '{cover}' not found in {folder_path}; using first image.")
-            cover = photos[0] if photos else ""
+            cover = names[0]
+        widths = gallery_widths(entry)
+        profile = get_profile(entry.get("encoder"), check_support=False)
+        distance = exclusion_distance(entry)
+        if distance is not None:
+            excluded = duplicate_exclusions(entry.get("name", ""), folder_path, names, cover, distance, cache)
+            names = [n for n in names if n not in excluded]
+            if excluded:
+                print(f"{entry.get('name')}: leaving out {len(excluded)} duplicate photo(s).")
+        with instrumentation.stage("payload", entry.get("name", "")):
+            photos = [describe_photo(entry.get("name", ""), folder_path, f, widths, profile, cache) for f in names]
         payload["galleries"].append({
             "name": entry.get("name"),
+            "folder": entry.get("folder") or entry.get("name", ""),
             "title": entry.get("title"),
             "coverPhoto": cover,
             "password": entry.get("password", ""),
             "downloadLink": entry.get("download_link", ""),
             "photos": photos,
         })
+        if profile.extension:
+            payload["galleries"][-1]["variantExt"] = profile.extension
     return payload
 
 
-def write_public_files(payload: Dict) -> None:
-    OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+def gallery_slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-").lower() or "gallery"
 
-    secrets = {g["name"]: {"password": g.get("password", ""), "downloadLink": g.get("downloadLink", "")} for g in payload.get("galleries", [])}
-    with open(SECRETS_JSON, "w", encoding="utf-8") as f:
-        json.dump(secrets, f, indent=2)
+
+def shard_filename(name: str, data: bytes) -> str:
+    return f"{gallery_slug(name)}.{content_hash(data)}.json"
+
+
+def access_salt() -> str:
+    """The site's access-file salt, created (and saved to the registry) on first use."""
+    registry = load_registry()
+    salt = registry.get("access_salt")
+    if not salt:
+        salt = secrets.token_hex(8)
+        registry["access_salt"] = salt
+        save_registry(registry)
+        print(f"Generated an access salt in {REGISTRY_PATH.name}.")
+    return salt
+
+
+def access_key(salt: str, name: str, passcode: str) -> str:
+    """File name stem of a gallery's access file; app.js derives the same key."""
+    digest = hashlib.sha256(f"{salt}\n{name}\n{passcode}".encode("utf-8")).hexdigest()
+    return digest[:ACCESS_KEY_LENGTH]
+
+
+def split_payload(
+    payload: Dict, salt: str = "", sprites: Optional[Tuple[List[Dict], Dict[str, Dict]]] = None
+) -> Tuple[Dict, Dict[str, bytes], Dict[str, bytes]]:
+    """Split the full payload into a small homepage index, per-gallery shards
+    and per-gallery access files.
+
+    Shard names carry a content hash, so they can be cached as immutable and
+    a changed gallery simply gets a new URL in the index. Access files are
+    named by a salted hash of gallery name and passcode, so only a visitor
+    who knows the passcode can find one; the index just says ``locked``.
+    ``sprites`` (from ``write_cover_sprites``) adds the cover sheets and
+    each gallery's cell to the index.
+    """
+    sheets, cells = sprites or ([], {})
+    index: Dict = {"accessSalt": salt, "coverSprites": sheets, "galleries": []}
+    shards: Dict[str, bytes] = {}
+    access: Dict[str, bytes] = {}
+    for gallery in payload.get("galleries", []):
+        photos = gallery.get("photos", [])
+        shard = {"name": gallery.get("name"), "photos": photos}
+        data = json.dumps(shard, separators=(",", ":")).encode("utf-8")
+        filename = shard_filename(gallery.get("name") or "", data)
+        shards[filename] = data
+
+        passcode = gallery.get("password", "")
+        key = access_key(salt, gallery.get("name") or "", passcode)
+        grant = {"name": gallery.get("name"), "downloadLink": gallery.get("downloadLink", "")}
+        access[f"{key}.json"] = json.dumps(grant, separators=(",", ":")).encode("utf-8")
+
+        entry = {k: v for k, v in gallery.items() if k not in ("photos", "password", "downloadLink", "folder")}
+        entry["locked"] = bool(passcode)
+        entry["photoCount"] = len(photos)
+        cover = next((p for p in photos if p.get("file") == gallery.get("coverPhoto")), None)
+        if cover:
+            entry["cover"] = cover
+        if gallery.get("name") in cells:
+            entry["sprite"] = cells[gallery["name"]]
+        entry["shard"] = f"{SHARDS_DIR.name}/{filename}"
+        index["galleries"].append(entry)
+    return index, shards, access
+
+
+def write_shards(shards: Dict[str, bytes]) -> None:
+    SHARDS_DIR.mkdir(parents=True, exist_ok=True)
+    for filename, data in shards.items():
+        shard_path = SHARDS_DIR / filename
+        if not shard_path.exists():
+            atomic_write_bytes(shard_path, data)
+    for stale in SHARDS_DIR.glob("*.json"):
+        if stale.name not in shards:
+            stale.unlink()
+
+
+def write_access_files(access: Dict[str, bytes]) -> None:
+    ACCESS_DIR.mkdir(parents=True, exist_ok=True)
+    for filename, data in access.items():
+        access_path = ACCESS_DIR / filename
+        if not access_path.exists() or access_path.read_bytes() != data:
+            atomic_write_bytes(access_path, data)
+    # A changed passcode leaves the old file behind; it must stop working.
+    for stale in ACCESS_DIR.glob("*.json"):
+        if stale.name not in access:
+            stale.unlink()
+
+
+def write_public_files(payload: Dict) -> None:
+    # Sprites, shards and access files land before the index that points at
+    # them, and each file is renamed into place, so a crash never leaves a
+    # broken site.
+    with instrumentation.stage("sprites"):
+        sprites = write_cover_sprites([
+            (g["name"], PUBLIC_IMAGES / (g.get("folder") or g["name"]) / g["coverPhoto"])
+            for g in payload.get("galleries", [])
+            if g.get("name") and g.get("coverPhoto")
+        ])
+    with instrumentation.stage("write json"):
+        index, shards, access = split_payload(payload, access_salt(), sprites)
+        write_shards(shards)
+        write_access_files(access)
+        OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(OUTPUT_JSON, json.dumps(index, indent=2))
+        LEGACY_SECRETS_JSON.unlink(missing_ok=True)
+
+
+def select_entries(registry: Dict, names: List[str], build_all: bool) -> List[Dict]:
+    if build_all:
+        return list(registry["galleries"])
+    by_name = {g.get("name"): g for g in registry["galleries"]}
+    missing = [n for n in names if n not in by_name]
+    if missing:
+        raise SystemExit(f"Unknown gallery name(s): {', '.join(missing)}. Check {REGISTRY_PATH}.")
+    return [by_name[n] for n in names]
+
+
+def images_to_resize(folder: Path, photos: List[str], cache: BuildCache) -> List[Path]:
+    """Photos over the web size target or not yet normalized (rotation, metadata, colour profile)."""
+    pending = []
+    with instrumentation.stage("scan", folder.name):
+        for file_name in photos:
+            try:
+                if not cache.info(folder / file_name).web_ready(RESIZE_TARGET):
+                    pending.append(folder / file_name)
+            except OSError:
+                # Let the resize engine report the broken file.
+                pending.append(folder / file_name)
+    return pending
+
+
+def run_grouped(
+    worker,
+    groups: List[Tuple[str, List[Tuple]]],
+    jobs: Optional[int],
+    desc: str,
+    label: str,
+    stage: str,
+    max_memory: Optional[int] = None,
+    journal: Optional[Journal] = None,
+) -> int:
+    """Run every gallery's tasks through one shared pool, then report per gallery.
+
+    The pool's wall time is recorded once for the whole batch; per-gallery
+    rows in the timing report come from the workers' own file timings.
+    """
+    tasks = [task for _, group in groups for task in group]
+    if not tasks:
+        return 0
+    with instrumentation.stage(stage):
+        results = run_batch(worker, tasks, jobs=jobs, desc=desc, max_memory=max_memory, journal=journal)
+    failed = report_errors(results)
+    offset = 0
+    for name, group in groups:
+        gallery_results = results[offset:offset + len(group)]
+        instrumentation.record_results(stage, name, gallery_results)
+        report_savings(f"{name} ({label})", gallery_results)
+        offset += len(group)
+    return failed
+
+
+def build_galleries(
+    entries: List[Dict],
+    cache: BuildCache,
+    jobs: Optional[int] = None,
+    resize: bool = True,
+    max_memory: Optional[int] = None,
+    resume: bool = False,
+) -> int:
+    """Headless resize + derivative pass over registry entries; returns the failure count.
+
+    Work from all galleries shares one process pool, so small galleries do
+    not leave cores idle while a large one finishes. In-place resizes are
+    journaled (see ``--resume``); derivatives need no journal, since every
+    variant is written atomically and fresh ones are skipped anyway.
+    """
+    prepared = []
+    for entry in entries:
+        name = entry.get("name", "")
+        folder_path = PUBLIC_IMAGES / entry.get("folder", name)
+        if not folder_path.is_dir():
+            print(f"Skipping '{name}': folder {folder_path} is missing.")
+            continue
+        photos = find_images(folder_path)
+        if not photos:
+            print(f"Skipping '{name}': no images in {folder_path}.")
+            continue
+        prepared.append((entry, name, folder_path, photos, get_profile(entry.get("encoder"))))
+
+    failed = 0
+    if resize:
+        groups = [
+            (name, [(str(p), RESIZE_TARGET, profile.name) for p in images_to_resize(folder_path, photos, cache)])
+            for entry, name, folder_path, photos, profile in prepared
+        ]
+        journal = Journal("build-resize", resume)
+        failed += run_grouped(resize_one, groups, jobs, "Resizing", "resize", "resize", max_memory, journal)
+
+    groups = []
+    for entry, name, folder_path, photos, profile in prepared:
+        with instrumentation.stage("plan", name):
+            groups.append((name, plan_derivatives(folder_path, name, photos, gallery_widths(entry), cache, profile)))
+    failed += run_grouped(derive_one, groups, jobs, "Derivatives", "derivatives vs. full size", "derivatives", max_memory)
+    return failed
+
+
+def add_common_options(parser: argparse.ArgumentParser, suppress: bool = False) -> None:
+    # Sub-commands re-declare these with SUPPRESS so a value given before the
+    # sub-command name is not overwritten by the sub-parser's default.
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=argparse.SUPPRESS if suppress else default_jobs(),
+        help="worker processes used for resizing (default: CPU count)",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=parse_memory,
+        default=argparse.SUPPRESS if suppress else None,
+        metavar="SIZE",
+        help="admit resize work only while its estimated memory fits, e.g. 4G (default: no limit)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="ignore the build cache and re-read every image",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="continue an interrupted resize from its journal instead of starting over",
+    )
+    instrumentation.add_arguments(parser, suppress)
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Add or update a gallery and regenerate the public site data.")
+    add_common_options(parser)
+    commands = parser.add_subparsers(dest="command")
+    build = commands.add_parser(
+        "build",
+        help="process galleries from the registry without prompts",
+        description="Resize and derive images for registry galleries, then write the public files once.",
+    )
+    add_common_options(build, suppress=True)
+    build.add_argument("names", nargs="*", help="gallery names from data/galleries.yaml")
+    build.add_argument("--all", action="store_true", help="build every gallery in the registry")
+    build.add_argument("--skip-resize", action="store_true", help="do not rewrite oversized or unnormalized originals")
+    duplicates = commands.add_parser(
+        "duplicates",
+        help="report duplicate and near-duplicate photos",
+        description="Find exact and near-duplicate photos within and across galleries using cached perceptual hashes.",
+    )
+    add_common_options(duplicates, suppress=True)
+    duplicates.add_argument("names", nargs="*", help="gallery names to check (default: every gallery)")
+    duplicates.add_argument(
+        "--distance",
+        type=int,
+        default=NEAR_DISTANCE,
+        help=f"max differing bits out of 64 to count as a near-duplicate (default: {NEAR_DISTANCE})",
+    )
+    duplicates.add_argument("--json", type=Path, help="also write the clusters to this file")
+    package = commands.add_parser(
+        "package",
+        help="build the originals download zip for galleries",
+        description=(
+            "Zip each gallery's full-resolution originals (JPEGs stored, not recompressed) and record "
+            "the archive path and sha256 in data/galleries.yaml."
+        ),
+    )
+    add_common_options(package, suppress=True)
+    package.add_argument("names", nargs="*", help="gallery names from data/galleries.yaml")
+    package.add_argument("--all", action="store_true", help="package every gallery in the registry")
+    package.add_argument(
+        "--source",
+        type=Path,
+        help="folder holding one originals folder per gallery (an entry's `originals` key wins)",
+    )
+    package.add_argument("--out", type=Path, default=ARCHIVES_DIR, help="where to write the zips (default: archives/)")
+    package.add_argument("--force", action="store_true", help="rebuild archives even if they are up to date")
+    watch = commands.add_parser(
+        "watch",
+        help="rebuild galleries as their files or the registry change",
+        description="Watch public/images and data/galleries.yaml; rebuild only the galleries that changed.",
+    )
+    add_common_options(watch, suppress=True)
+    watch.add_argument("--debounce", type=float, default=1.0, help="seconds of quiet before rebuilding (default: 1)")
+    watch.add_argument("--poll", action="store_true", help="poll instead of using inotify")
+    watch.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds (default: 1)")
+    watch.add_argument("--skip-resize", action="store_true", help="do not rewrite oversized or unnormalized originals")
+    args = parser.parse_args(argv)
+    if args.command == "build" and not (args.all or args.names):
+        build.error("name one or more galleries, or pass --all")
+    if args.command == "package" and not (args.all or args.names):
+        package.error("name one or more galleries, or pass --all")
+    return args
+
+
+def run_build(args: argparse.Namespace) -> None:
+    registry = load_registry()
+    entries = select_entries(registry, args.names, args.all)
+    cache = BuildCache(rebuild=args.rebuild)
+    print(f"\nBuilding {len(entries)} gallery(ies) with {args.jobs} worker(s)")
+    failed = build_galleries(
+        entries, cache, args.jobs, resize=not args.skip_resize, max_memory=args.max_memory, resume=args.resume
+    )
+    payload = build_public_payload(registry, cache)
+    write_public_files(payload)
+    duplicates = find_duplicates(entries, cache)
+    with instrumentation.stage("cache save"):
+        cache.save()
+    print(f"\nUpdated public data: {OUTPUT_JSON} (+ {SHARDS_DIR})")
+    if duplicates:
+        print(f"Found {len(duplicates)} duplicate photo cluster(s); run `gallery_wizard.py duplicates` for details.")
+    instrumentation.report(args)
+    if failed:
+        raise SystemExit(f"{failed} file(s) failed; see the list above.")
+
+
+def run_duplicates(args: argparse.Namespace) -> None:
+    registry = load_registry()
+    entries = select_entries(registry, args.names, not args.names)
+    cache = BuildCache(rebuild=args.rebuild)
+    report = find_duplicates(entries, cache, args.distance)
+    with instrumentation.stage("cache save"):
+        cache.save()
+    print_duplicates(report, args.distance)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"distance": args.distance, "clusters": report}, f, indent=2)
+    instrumentation.report(args)
+
+
+def run_package(args: argparse.Namespace) -> None:
+    registry = load_registry()
+    entries = select_entries(registry, args.names, args.all)
+    slugs: Dict[str, List[str]] = {}
+    for entry in registry["galleries"]:
+        slugs.setdefault(gallery_slug(entry.get("name", "")), []).append(entry.get("name", ""))
+    clashes = [names for names in (slugs[gallery_slug(e.get("name", ""))] for e in entries) if len(names) > 1]
+    if clashes:
+        listed = "; ".join(sorted({" and ".join(repr(n) for n in names) for names in clashes}))
+        raise SystemExit(f"Galleries would share an archive name: {listed}. Rename one in {REGISTRY_PATH}.")
+    tasks, targets = [], []
+    for entry in entries:
+        name = entry.get("name", "")
+        source = originals_folder(entry, args.source)
+        if source is None or not source.is_dir():
+            print(f"Skipping '{name}': no originals folder (set `originals` in the registry or pass --source).")
+            continue
+        dest = archive_path(args.out, gallery_slug(name))
+        targets.append((entry, dest))
+        if not args.force and is_current(source, dest):
+            print(f"'{name}' is up to date: {dest}")
+            continue
+        tasks.append((str(source), str(dest)))
+
+    with instrumentation.stage("package"):
+        results = run_batch(package_one, tasks, jobs=args.jobs, desc="Packaging") if tasks else []
+    failed = report_errors(results, "packaged")
+    broken = {r.path for r in results if not r.ok}
+    for r in results:
+        if r.ok:
+            print(f"{Path(r.path).name}: {format_bytes(r.bytes_out)} from {format_bytes(r.bytes_in)} of originals")
+
+    changed = False
+    for entry, dest in targets:
+        digest = read_checksum(dest)
+        if str(dest) in broken or not digest:
+            continue
+        archive = relative_to_root(dest)
+        if entry.get("archive") != archive or entry.get("archive_sha256") != digest:
+            entry["archive"], entry["archive_sha256"] = archive, digest
+            changed = True
+    if changed:
+        save_registry(registry)
+        print(f"Recorded archive paths and checksums in {REGISTRY_PATH}")
+    instrumentation.report(args)
+    if failed:
+        raise SystemExit(f"{failed} archive(s) failed; see the list above.")
+
+
+def changed_galleries(changed: set, registry: Dict, cache: BuildCache) -> set:
+    """Names of registry galleries with an image added, removed or modified.
+
+    Files whose stat still matches the build cache are ignored, which filters
+    out the events caused by our own in-place resizes.
+    """
+    by_folder = {PUBLIC_IMAGES / e.get("folder", e.get("name", "")): e.get("name", "") for e in registry["galleries"]}
+    names = set()
+    for path in changed:
+        if path in by_folder:
+            names.add(by_folder[path])
+        elif (
+            path.parent in by_folder
+            and not path.name.startswith(".")
+            and path.suffix.lower() in IMAGE_EXTS
+            and not cache.is_current(path)
+        ):
+            names.add(by_folder[path.parent])
+    return names
+
+
+def run_watch(args: argparse.Namespace) -> None:
+    registry = load_registry()
+    cache = BuildCache(rebuild=args.rebuild)
+    print("Reading current galleries...")
+    payloads = {g["name"]: g for g in build_public_payload(registry, cache)["galleries"]}
+    cache.save()
+    watcher = make_watcher([PUBLIC_IMAGES, REGISTRY_PATH.parent], args.poll, args.interval)
+    print(f"Watching {PUBLIC_IMAGES} and {REGISTRY_PATH} with {watcher.name} (Ctrl+C to stop)")
+    try:
+        while True:
+            changed, first = collect(watcher, args.debounce)
+            started = time.monotonic()
+            names = set()
+            if REGISTRY_PATH in changed:
+                try:
+                    updated = load_registry()
+                except yaml.YAMLError as exc:
+                    print(f"Ignoring unreadable {REGISTRY_PATH.name}: {exc}")
+                    continue
+                before = {e.get("name"): e for e in registry["galleries"]}
+                names |= {e.get("name") for e in updated["galleries"] if before.get(e.get("name")) != e}
+                registry = updated
+            names |= changed_galleries(changed, registry, cache)
+            current = [e.get("name") for e in registry["galleries"]]
+            removed = set(payloads) - set(current)
+            if not names and not removed:
+                continue
+
+            entries = [e for e in registry["galleries"] if e.get("name") in names]
+            failed = build_galleries(entries, cache, args.jobs, resize=not args.skip_resize, max_memory=args.max_memory)
+            for gallery in build_public_payload({"galleries": entries}, cache)["galleries"]:
+                payloads[gallery["name"]] = gallery
+            for name in removed:
+                del payloads[name]
+            write_public_files({"galleries": [payloads[n] for n in current if n in payloads]})
+            cache.save()
+            done = time.monotonic()
+            rebuilt = ", ".join(sorted(names)) or "-"
+            print(
+                f"[{time.strftime('%H:%M:%S')}] Rebuilt {rebuilt}"
+                f"{f' (removed {len(removed)})' if removed else ''} in {done - started:.2f}s; "
+                f"{done - first:.2f}s after the first change{f', {failed} file(s) failed' if failed else ''}"
+            )
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
+        instrumentation.report(args)
+
+
+def run_wizard(args: argparse.Namespace) -> None:
     print("\nStarting Gallery Wizard")
+    cache = BuildCache(rebuild=args.rebuild)
     registry = load_registry()
     entry = choose_gallery(registry)
-    updated_entry = update_entry(entry)
+    updated_entry = update_entry(entry, args.jobs, cache, args.max_memory, args.resume)
+    cache.save()
     folder_path = PUBLIC_IMAGES / updated_entry["folder"]
     photos = find_images(folder_path)
     cover = updated_entry.get("cover", "")
@@ -270,12 +900,29 @@ def main():
 
     persist_entry(registry, updated_entry)
     save_registry(registry)
-    payload = build_public_payload(registry)
+    payload = build_public_payload(registry, cache)
     write_public_files(payload)
+    with instrumentation.stage("cache save"):
+        cache.save()
     print(f"\nDone. Updated registry: {REGISTRY_PATH}")
-    print(f"Updated public data: {OUTPUT_JSON}")
-    print(f"Secrets (public): {SECRETS_JSON}")
-    print("You can now deploy.")
+    print(f"Updated public data: {OUTPUT_JSON} (+ {SHARDS_DIR})")
+    print(f"Access files: {ACCESS_DIR} (one per gallery, named by a salted hash of name + passcode)")
+    print("Run `python scripts/fingerprint.py` to preview the deployable dist/ locally, or just push; CI builds it.")
+    instrumentation.report(args)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.command == "build":
+        run_build(args)
+    elif args.command == "duplicates":
+        run_duplicates(args)
+    elif args.command == "package":
+        run_package(args)
+    elif args.command == "watch":
+        run_watch(args)
+    else:
+        run_wizard(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+
+# Everything any stage treats as a photo; each stage narrows this further.
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class ImageIndex:
+    """Image files under a directory tree, listed by one ``os.scandir`` walk.
+
+    ``folders`` maps each directory (relative to ``root``, ``/``-separated,
+    in sorted order) to its sorted image names; ``root`` itself appears as
+    ``""`` only if it holds images directly. Stages share the index rather
+    than listing the tree again; file names do not change when a stage
+    rewrites a file in place, so the index stays valid for the whole run.
+    """
+
+    root: Path
+    folders: Dict[str, List[str]] = field(default_factory=dict)
+    manifests: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def scan(cls, root: Union[str, Path]) -> "ImageIndex":
+        index = cls(Path(root))
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            images, subdirs = [], []
+            with os.scandir(index.root / rel) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir():
+                        subdirs.append(f"{rel}/{entry.name}" if rel else entry.name)
+                    elif entry.name == MANIFEST_NAME:
+                        index.manifests.add(rel)
+                    elif entry.name.lower().endswith(IMAGE_EXTS):
+                        images.append(entry.name)
+            if rel or images:
+                index.folders[rel] = sorted(images)
+            pending.extend(sorted(subdirs, reverse=True))
+        index.folders = dict(sorted(index.folders.items()))
+        return index
+
+    def subtree(self, rel: str) -> "ImageIndex":
+        """The part of the index under ``rel``, re-rooted there (no rescan)."""
+        prefix = f"{rel}/"
+        folders = {
+            "" if key == rel else key[len(prefix):]: names
+            for key, names in self.folders.items()
+            if key == rel or key.startswith(prefix)
+        }
+        manifests = {"" if key == rel else key[len(prefix):] for key in self.manifests if key == rel or key.startswith(prefix)}
+        return ImageIndex(self.root / rel, folders, manifests)
+
+    def subfolders(self) -> List[str]:
+        """Directories below the root, i.e. one per gallery for public/images."""
+        return [rel for rel in self.folders if rel]
+
+    def images(self, rel: str, exts: Iterable[str] = IMAGE_EXTS) -> List[str]:
+        exts = tuple(exts)
+        return [name for name in self.folders.get(rel, []) if name.lower().endswith(exts)]
+
+    def files(self, exts: Iterable[str] = IMAGE_EXTS) -> List[Path]:
+        """Every image in the tree with one of ``exts``, as full paths."""
+        exts = tuple(exts)
+        return [self.root / rel / name for rel in self.folders for name in self.images(rel, exts)]
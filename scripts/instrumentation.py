@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is reported as 0
+    resource = None
+
+PROC_IO = Path("/proc/self/io")
+DEFAULT_SLOWEST = 10
+
+
+def _io_counters() -> Tuple[int, int]:
+    """Bytes read/written by this process so far (Linux only, else zeros)."""
+    try:
+        fields = dict(line.split(":", 1) for line in PROC_IO.read_text().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _cpu_seconds() -> float:
+    # Includes reaped children, i.e. process-pool workers once a batch ends.
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _peak_rss() -> int:
+    if resource is None:
+        return 0
+    scale = 1 if sys.platform == "darwin" else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+
+
+@dataclass
+class StageStats:
+    stage: str
+    gallery: str
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    peak_rss: int = 0
+
+
+@dataclass
+class Recorder:
+    """Collects per-stage, per-gallery timings for one run.
+
+    Stages measured in this process get wall, CPU, I/O and peak memory.
+    Work done in pool workers is folded in from the ``timings`` each
+    ``ResizeResult`` carries, as ``<stage>/<phase>`` rows.
+    """
+
+    stats: Dict[Tuple[str, str], StageStats] = field(default_factory=dict)
+    files: List[Tuple[float, str, str, Dict[str, float]]] = field(default_factory=list)
+    events: List[Dict] = field(default_factory=list)
+
+    def _row(self, stage: str, gallery: str) -> StageStats:
+        key = (stage, gallery)
+        if key not in self.stats:
+            self.stats[key] = StageStats(stage, gallery)
+        return self.stats[key]
+
+    @contextmanager
+    def stage(self, name: str, gallery: str = "") -> Iterator[None]:
+        read0, written0 = _io_counters()
+        cpu0 = _cpu_seconds()
+        started = time.time()
+        wall0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            read1, written1 = _io_counters()
+            row = self._row(name, gallery)
+            row.calls += 1
+            row.wall += wall
+            row.cpu += _cpu_seconds() - cpu0
+            row.bytes_read += read1 - read0
+            row.bytes_written += written1 - written0
+            row.peak_rss = max(row.peak_rss, _peak_rss())
+            self.events.append({
+                "name": name, "cat": gallery or "run", "ph": "X", "pid": os.getpid(), "tid": 0,
+                "ts": int(started * 1e6), "dur": int(wall * 1e6),
+            })
+
+    def record_results(self, stage: str, gallery: str, results: List) -> None:
+        """Fold per-file worker timings and byte counts into the report."""
+        row = self._row(stage, gallery)
+        for r in results:
+            row.bytes_read += r.bytes_in
+            row.bytes_written += r.bytes_out
+            for phase, seconds in r.timings.items():
+                sub = self._row(f"{stage}/{phase}", gallery)
+                sub.calls += 1
+                sub.wall += seconds
+            total = sum(r.timings.values())
+            self.files.append((total, stage, r.path, dict(r.timings)))
+            if r.started:
+                args = dict(r.timings)
+                if getattr(r, "metadata_bytes", 0):
+                    args["metadata_bytes"] = r.metadata_bytes
+                self.events.append({
+                    "name": Path(r.path).name, "cat": stage, "ph": "X", "pid": r.worker, "tid": 0,
+                    "ts": int(r.started * 1e6), "dur": int(total * 1e6), "args": args,
+                })
+
+    def summary(self, slowest: int = DEFAULT_SLOWEST) -> Dict:
+        return {
+            "stages": [vars(s) for s in self.stats.values()],
+            "slowest_files": [
+                {"seconds": round(t, 4), "stage": stage, "path": path, "timings": timings}
+                for t, stage, path, timings in sorted(self.files, key=lambda f: f[0], reverse=True)[:slowest]
+            ],
+        }
+
+    def print_report(self, slowest: int = DEFAULT_SLOWEST) -> None:
+        if not self.stats:
+            return
+        print(f"\n{'stage':<24} {'gallery':<24} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'read MB':>9} {'written MB':>10} {'peak MB':>8}")
+        for s in sorted(self.stats.values(), key=lambda s: (s.gallery, s.stage)):
+            cpu = f"{s.cpu:9.3f}" if "/" not in s.stage else f"{'-':>9}"
+            print(
+                f"{s.stage:<24} {s.gallery[:24]:<24} {s.calls:>6} {s.wall:9.3f} {cpu} "
+                f"{s.bytes_read / 1e6:9.1f} {s.bytes_written / 1e6:10.1f} {s.peak_rss / 1e6:8.1f}"
+            )
+        print("(<stage>/<phase> rows are summed worker time across processes)")
+        top = self.summary(slowest)["slowest_files"]
+        if top:
+            print(f"\nSlowest {len(top)} file(s):")
+            for f in top:
+                phases = ", ".join(f"{k} {v:.2f}s" for k, v in f["timings"].items())
+                print(f" {f['seconds']:8.3f}s  {f['stage']:<12} {f['path']}  ({phases})")
+
+    def write_trace(self, path: Path, slowest: int = DEFAULT_SLOWEST) -> None:
+        """Write the summary plus Chrome/Perfetto ``traceEvents`` to ``path``."""
+        data = self.summary(slowest)
+        data["traceEvents"] = sorted(self.events, key=lambda e: e["ts"])
+        data["displayTimeUnit"] = "ms"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"Timing trace: {path}")
+
+
+# One recorder per run; stages recorded before report() is called are kept.
+_active = Recorder()
+
+
+def recorder() -> Recorder:
+    return _active
+
+
+def stage(name: str, gallery: str = ""):
+    return _active.stage(name, gallery)
+
+
+def record_results(stage_name: str, gallery: str, results: List) -> None:
+    _active.record_results(stage_name, gallery, results)
+
+
+def add_arguments(parser, suppress: bool = False) -> None:
+    """Add --timings/--trace/--slowest; ``suppress`` as in the wizard's sub-commands."""
+    def default(value):
+        return argparse.SUPPRESS if suppress else value
+
+    parser.add_argument("--timings", action="store_true", default=default(False),
+                        help="print a per-stage timing and resource table at the end")
+    parser.add_argument("--trace", type=Path, default=default(None),
+                        help="also write the timings as JSON (Chrome/Perfetto trace format) to this file")
+    parser.add_argument("--slowest", type=int, default=default(DEFAULT_SLOWEST),
+                        help=f"how many of the slowest files to list (default: {DEFAULT_SLOWEST})")
+
+
+def report(args) -> None:
+    slowest = getattr(args, "slowest", DEFAULT_SLOWEST)
+    if getattr(args, "timings", False):
+        _active.print_report(slowest)
+    if getattr(args, "trace", None):
+        _active.write_trace(args.trace, slowest)
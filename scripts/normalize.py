@@ -0,0 +1,168 @@
+import io
+import struct
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+try:  # Colour management needs Pillow built with LittleCMS.
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+# Everything Pillow may carry from a source into a re-encoded file. EXIF holds
+# the camera's embedded thumbnail as well, so dropping it drops that too.
+METADATA_KEYS = ("exif", "xmp", "icc_profile", "comment", "photoshop")
+ORIENTATION_TAG = 0x0112
+# Orientations 5-8 are rotated a quarter turn, so width and height swap.
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+# Segments/chunks strip_metadata drops: JPEG APP1 (EXIF, XMP), APP13
+# (Photoshop) and COM, plus APP2 when it holds an ICC profile; PNG eXIf,
+# iCCP and the XMP iTXt chunk; WebP ICCP, EXIF and XMP chunks (with their
+# VP8X header flags).
+JPEG_DROPPED = {0xE1, 0xED, 0xFE}
+PNG_DROPPED = {b"eXIf", b"iCCP"}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+WEBP_DROPPED = {b"ICCP": 0x20, b"EXIF": 0x08, b"XMP ": 0x04}
+
+
+def orientation(img: Image.Image) -> int:
+    return img.getexif().get(ORIENTATION_TAG) or 1
+
+
+def metadata_bytes(img: Image.Image) -> int:
+    """Bytes of metadata an open image carries (per ``METADATA_KEYS``)."""
+    return sum(len(value) for key in METADATA_KEYS if isinstance(value := img.info.get(key), (bytes, str)))
+
+
+def needs_normalizing(img: Image.Image) -> bool:
+    """True if ``normalize`` would change the file; reads only the header."""
+    return orientation(img) != 1 or any(img.info.get(key) for key in METADATA_KEYS)
+
+
+def _is_srgb(profile) -> bool:
+    return "srgb" in ImageCms.getProfileDescription(profile).lower()
+
+
+def _conversion_profile(img: Image.Image):
+    """The embedded profile ``to_srgb`` would convert from, or None."""
+    icc = img.info.get("icc_profile")
+    if not icc or ImageCms is None or img.mode in ("L", "LA", "I", "I;16", "F", "1"):
+        return None
+    try:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+        return None if _is_srgb(source) else source
+    except (ImageCms.PyCMSError, OSError, ValueError):
+        return None
+
+
+def changes_pixels(img: Image.Image) -> bool:
+    """True if ``normalize`` would rotate or colour-convert, not just drop metadata."""
+    return orientation(img) != 1 or _conversion_profile(img) is not None
+
+
+def to_srgb(img: Image.Image) -> Image.Image:
+    """Convert pixels from their embedded ICC profile to sRGB.
+
+    Browsers treat untagged images as sRGB, so a wide-gamut (Display P3,
+    Adobe RGB) photo that loses its profile without conversion looks washed
+    out. Greyscale and untagged images are returned as they are; without
+    LittleCMS, or with a profile it cannot read, the pixels are kept as-is.
+    """
+    source = _conversion_profile(img)
+    if source is None:
+        return img
+    try:
+        if img.mode not in ("RGB", "RGBA", "CMYK"):
+            img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+        mode = "RGBA" if img.mode == "RGBA" else "RGB"
+        return ImageCms.profileToProfile(img, source, ImageCms.createProfile("sRGB"), outputMode=mode)
+    except (ImageCms.PyCMSError, OSError, ValueError):
+        return img
+
+
+def normalize(img: Image.Image) -> Tuple[Image.Image, int]:
+    """Bake in the EXIF orientation, convert to sRGB and drop all metadata.
+
+    ``img`` must be loaded (or at least drafted). Returns the normalized
+    image, with an empty ``info`` so no encoder can copy metadata back, and
+    the number of metadata bytes the source carried.
+    """
+    stripped = metadata_bytes(img)
+    img = to_srgb(ImageOps.exif_transpose(img))
+    for key in METADATA_KEYS:
+        img.info.pop(key, None)
+    return img, stripped
+
+
+def _strip_jpeg(data: bytes) -> Optional[bytes]:
+    if data[:2] != b"\xff\xd8":
+        return None
+    out = [data[:2]]
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xDA:
+            # Start of scan: the entropy-coded image data follows, kept as-is.
+            break
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        segment = data[pos:pos + 2 + length]
+        icc = marker == 0xE2 and segment[4:16] == b"ICC_PROFILE\0"
+        if marker not in JPEG_DROPPED and not icc:
+            out.append(segment)
+        pos += 2 + length
+    else:
+        return None
+    out.append(data[pos:])
+    return b"".join(out)
+
+
+def _strip_png(data: bytes) -> Optional[bytes]:
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    out = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length = struct.unpack(">I", data[pos:pos + 4])[0]
+        kind = data[pos + 4:pos + 8]
+        chunk = data[pos:pos + 12 + length]
+        xmp = kind == b"iTXt" and chunk[8:26] == b"XML:com.adobe.xmp\0"
+        if kind not in PNG_DROPPED and not xmp:
+            out.append(chunk)
+        pos += 12 + length
+    return b"".join(out)
+
+
+def _strip_webp(data: bytes) -> Optional[bytes]:
+    if data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        return None
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(data):
+        kind = data[pos:pos + 4]
+        length = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        # Chunk payloads are padded to an even length.
+        chunk = data[pos:pos + 8 + length + (length & 1)]
+        if kind not in WEBP_DROPPED:
+            chunks.append(chunk)
+        pos += 8 + length + (length & 1)
+    if chunks and chunks[0][:4] == b"VP8X":
+        flags = chunks[0][8] & ~sum(WEBP_DROPPED.values())
+        chunks[0] = chunks[0][:8] + bytes([flags]) + chunks[0][9:]
+    body = b"WEBP" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def strip_metadata(data: bytes, fmt: Optional[str]) -> Optional[bytes]:
+    """Drop metadata from an encoded JPEG, PNG or WebP without touching its pixels.
+
+    Only right for images ``changes_pixels`` is False for: any profile
+    dropped here is sRGB (or unusable), which browsers assume anyway.
+    Returns None for other formats or a file it cannot parse.
+    """
+    if fmt == "JPEG":
+        return _strip_jpeg(data)
+    if fmt == "PNG":
+        return _strip_png(data)
+    if fmt == "WEBP":
+        return _strip_webp(data)
+    return None
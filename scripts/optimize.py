@@ -0,0 +1,309 @@
+import fnmatch
+import gzip
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import brotli
+except ImportError:  # optional; without it only .gz siblings are written
+    brotli = None
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGETS_PATH = ROOT / "data" / "budgets.json"
+COMPRESSIBLE_EXTS = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".webmanifest"}
+MIN_COMPRESS_SIZE = 256
+
+_WORD = re.compile(r"[A-Za-z0-9_$\\\u0080-\uffff]")
+# After these a '/' starts a regex literal rather than a division.
+_REGEX_AFTER_CHARS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_AFTER_WORDS = {"return", "typeof", "case", "do", "else", "in", "of", "void", "yield", "await", "delete", "throw", "new"}
+
+
+def _is_word(ch: str) -> bool:
+    return bool(ch) and bool(_WORD.match(ch))
+
+
+def _skip_quoted(src: str, i: int, quote: str) -> int:
+    """Index just past the string/template chunk opened at ``src[i]``."""
+    i += 1
+    while i < len(src):
+        if src[i] == "\\":
+            i += 2
+            continue
+        if src[i] == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(src: str, i: int) -> int:
+    i += 1
+    in_class = False
+    while i < len(src):
+        ch = src[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "[":
+            in_class = True
+        elif ch == "]":
+            in_class = False
+        elif ch == "/" and not in_class:
+            i += 1
+            while i < len(src) and _is_word(src[i]):
+                i += 1
+            return i
+        elif ch == "\n":
+            break
+        i += 1
+    return i
+
+
+def minify_js(src: str) -> str:
+    """Drop comments and redundant whitespace; never renames or reorders code.
+
+    Line breaks are kept wherever automatic semicolon insertion could depend
+    on them, so the output parses exactly like the input.
+    """
+    out: List[str] = []
+    pending = ""
+    # One counter per open template ``${``; a '}' at depth 0 resumes the template.
+    braces: List[int] = []
+    i, n = 0, len(src)
+
+    def last() -> str:
+        return out[-1][-1] if out else ""
+
+    def emit(token: str) -> None:
+        nonlocal pending
+        prev, first = last(), token[0]
+        if pending == "\n" and prev and prev not in "{;,(" and first not in "});,":
+            out.append("\n")
+        elif pending and (
+            (_is_word(prev) and _is_word(first)) or (prev in "+-" and first == prev) or (prev == "/" and first == "/")
+        ):
+            out.append(" ")
+        pending = ""
+        out.append(token)
+
+    def template(i: int) -> int:
+        # Copy template text from its opening '`' (or a closing '}') to its end or the next '${'.
+        start = i
+        i += 1
+        while i < n:
+            if src[i] == "\\":
+                i += 2
+                continue
+            if src[i] == "`":
+                emit(src[start:i + 1])
+                return i + 1
+            if src.startswith("${", i):
+                emit(src[start:i + 2])
+                braces.append(0)
+                return i + 2
+            i += 1
+        emit(src[start:])
+        return n
+
+    while i < n:
+        ch = src[i]
+        if ch in " \t\r\n\f\v":
+            j = i
+            while j < n and src[j] in " \t\r\n\f\v":
+                j += 1
+            pending = "\n" if "\n" in src[i:j] or pending == "\n" else (pending or " ")
+            i = j
+        elif src.startswith("//", i):
+            while i < n and src[i] != "\n":
+                i += 1
+        elif src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            pending = "\n" if "\n" in src[i:end] or pending == "\n" else (pending or " ")
+            i = end
+        elif ch == "/":
+            prev = last()
+            word = re.search(r"[A-Za-z_$]+$", out[-1]) if out and _is_word(prev) else None
+            if not prev or prev in _REGEX_AFTER_CHARS or (word and word.group(0) in _REGEX_AFTER_WORDS):
+                j = _skip_regex(src, i)
+                emit(src[i:j])
+                i = j
+            else:
+                emit(ch)
+                i += 1
+        elif ch in "'\"":
+            j = _skip_quoted(src, i, ch)
+            emit(src[i:j])
+            i = j
+        elif ch == "`":
+            i = template(i)
+        elif ch == "{" and braces:
+            braces[-1] += 1
+            emit(ch)
+            i += 1
+        elif ch == "}" and braces:
+            if braces[-1] == 0:
+                # Back inside the template literal: copy it on from the '}'.
+                braces.pop()
+                pending = ""
+                i = template(i)
+            else:
+                braces[-1] -= 1
+                emit(ch)
+                i += 1
+        else:
+            j = i + 1
+            if _is_word(ch):
+                while j < n and _is_word(src[j]):
+                    j += 1
+            emit(src[i:j])
+            i = j
+    return "".join(out).strip() + "\n"
+
+
+def minify_css(src: str) -> str:
+    """Strip comments and whitespace the CSS grammar does not need."""
+    out: List[str] = []
+    strings: List[str] = []
+    i, n = 0, len(src)
+    while i < n:
+        ch = src[i]
+        if src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            if out and out[-1] != " ":
+                out.append(" ")
+        elif ch in "'\"":
+            # Park strings so the whitespace rules below cannot touch them.
+            j = _skip_quoted(src, i, ch)
+            out.append(f"\0{len(strings)}\0")
+            strings.append(src[i:j])
+            i = j
+        elif ch.isspace():
+            while i < n and src[i].isspace():
+                i += 1
+            if out and out[-1] != " ":
+                out.append(" ")
+        else:
+            out.append(ch)
+            i += 1
+    text = "".join(out)
+    # Leave spaces around '+', '-' and '(' alone: calc() and media queries need them.
+    text = re.sub(r" ?([{};,>~]) ?", r"\1", text)
+    text = re.sub(r": ", ":", text)
+    text = text.replace(";}", "}")
+    text = re.sub(r"\0(\d+)\0", lambda m: strings[int(m.group(1))], text)
+    return text.strip() + "\n"
+
+
+_HTML_RAW = re.compile(r"(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)", re.S | re.I)
+_HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+
+
+def _minify_html_text(text: str) -> str:
+    text = _HTML_COMMENT.sub("", text)
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def minify_html(src: str) -> str:
+    """Drop comments and indentation; inline scripts and styles are minified too."""
+    parts: List[str] = []
+    pos = 0
+    for match in _HTML_RAW.finditer(src):
+        parts.append(_minify_html_text(src[pos:match.start()]))
+        open_tag, tag, body, close_tag = match.group(1), match.group(2).lower(), match.group(3), match.group(4)
+        if tag == "script" and body.strip() and "src=" not in open_tag and "json" not in open_tag.lower():
+            body = minify_js(body).strip()
+        elif tag == "style":
+            body = minify_css(body).strip()
+        parts.append(f"{open_tag}{body}{close_tag}")
+        pos = match.end()
+    parts.append(_minify_html_text(src[pos:]))
+    return "\n".join(p for p in parts if p) + "\n"
+
+
+def minify_json(src: str) -> str:
+    return json.dumps(json.loads(src), separators=(",", ":"), ensure_ascii=False)
+
+
+MINIFIERS = {".js": minify_js, ".css": minify_css, ".html": minify_html, ".json": minify_json}
+
+
+def minify_bytes(data: bytes, ext: str) -> bytes:
+    """Minify ``data`` by file extension; unknown types come back unchanged."""
+    minifier = MINIFIERS.get(ext.lower())
+    if not minifier:
+        return data
+    return minifier(data.decode("utf-8")).encode("utf-8")
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte-identical between builds.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_bytes(data: bytes) -> Optional[bytes]:
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=11, lgwin=24)
+
+
+def precompress(files: Iterable[Path]) -> Dict[Path, Dict[str, int]]:
+    """Write ``.gz`` (and ``.br`` when brotli is installed) next to each text file.
+
+    Siblings that would not be smaller than the file itself are skipped.
+    Returns ``{path: {"raw": n, "gzip": n, "br": n}}`` for the budget check.
+    """
+    sizes: Dict[Path, Dict[str, int]] = {}
+    for path in files:
+        if path.suffix.lower() not in COMPRESSIBLE_EXTS:
+            continue
+        data = path.read_bytes()
+        entry = {"raw": len(data)}
+        for kind, suffix, packed in (("gzip", ".gz", gzip_bytes(data)), ("br", ".br", brotli_bytes(data))):
+            if packed is None:
+                continue
+            entry[kind] = len(packed)
+            if len(data) >= MIN_COMPRESS_SIZE and len(packed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(packed)
+        sizes[path] = entry
+    return sizes
+
+
+def load_budgets(path: Path = BUDGETS_PATH) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("budgets", [])
+
+
+def check_budgets(sizes: Dict[str, Dict[str, int]], budgets: List[Dict]) -> List[str]:
+    """Compare sizes (keyed by logical path) against the budgets; print a table.
+
+    Each budget names a glob ``path`` and any of ``raw``/``gzip``/``br`` byte
+    limits. Returns one message per file over a limit.
+    """
+    failures = []
+    rows = []
+    for logical, entry in sorted(sizes.items()):
+        for budget in budgets:
+            if not fnmatch.fnmatchcase(logical, budget["path"]):
+                continue
+            for kind in ("raw", "gzip", "br"):
+                limit = budget.get(kind)
+                if limit is None or kind not in entry:
+                    continue
+                over = entry[kind] > limit
+                rows.append((logical, kind, entry[kind], limit, "OVER" if over else "ok"))
+                if over:
+                    failures.append(f"{logical}: {kind} {entry[kind]} B > budget {limit} B")
+            break
+    if rows:
+        print(f"\n{'file':<44} {'size':>5} {'bytes':>9} {'budget':>9}")
+        for logical, kind, size, limit, status in rows:
+            print(f"{logical[:44]:<44} {kind:>5} {size:9d} {limit:9d}  {status}")
+    if brotli is None and any("br" in b for b in budgets):
+        print("brotli is not installed (pip install brotli); skipped .br files and their budgets.")
+    return failures
@@ -0,0 +1,102 @@
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from PIL import Image
+
+# dHash: compare each pixel of a 9x8 greyscale thumbnail with its right-hand
+# neighbour. Re-encodes, resizes and light edits of a photo land within a few
+# bits of each other; different frames of a burst usually do not.
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+NEAR_DISTANCE = 6
+
+T = TypeVar("T")
+
+
+def dhash(img: Image.Image) -> str:
+    """64-bit difference hash of an already-open image, as 16 hex digits."""
+    if img.format == "JPEG":
+        img.draft("L", (HASH_WIDTH * 8, HASH_HEIGHT * 8))
+    small = img.convert("L").resize((HASH_WIDTH, HASH_HEIGHT), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for y in range(HASH_HEIGHT):
+        row = pixels[y * HASH_WIDTH:(y + 1) * HASH_WIDTH]
+        for x in range(HASH_WIDTH - 1):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return f"{value:016x}"
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree(Generic[T]):
+    """Burkhard-Keller tree over 64-bit hashes for Hamming-radius queries.
+
+    Each child edge is labelled with its distance to the parent, so a query
+    only descends edges within ``radius`` of its own distance to the node.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, T]] = ()):
+        self.root: Optional[list] = None
+        self.size = 0
+        for value, item in items:
+            self.add(value, item)
+
+    def add(self, value: int, item: T) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value: int, radius: int) -> List[Tuple[int, T]]:
+        """All ``(distance, item)`` pairs within ``radius`` of ``value``."""
+        found: List[Tuple[int, T]] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def clusters(hashes: Dict[T, int], radius: int = NEAR_DISTANCE) -> List[List[T]]:
+    """Group items whose hashes are within ``radius`` (transitively).
+
+    Returns clusters of two or more items, each in input order.
+    """
+    tree: BKTree[T] = BKTree((value, key) for key, value in hashes.items())
+    order = {key: i for i, key in enumerate(hashes)}
+    parent = {key: key for key in hashes}
+
+    def find(key: T) -> T:
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key, value in hashes.items():
+        for _, other in tree.query(value, radius):
+            a, b = find(key), find(other)
+            if a != b:
+                parent[max(a, b, key=order.get)] = min(a, b, key=order.get)
+
+    groups: Dict[T, List[T]] = {}
+    for key in hashes:
+        groups.setdefault(find(key), []).append(key)
+    return [g for g in groups.values() if len(g) > 1]
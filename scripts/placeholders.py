@@ -0,0 +1,80 @@
+import math
+from typing import List, Tuple
+
+from PIL import Image
+
+# BlurHash (https://blurha.sh): a ~30 character string the browser decodes
+# into a blurred preview, small enough to inline for every photo.
+X_COMPONENTS = 4
+Y_COMPONENTS = 3
+SAMPLE_SIDE = 32
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+_SRGB_TO_LINEAR = [
+    (v / 255) / 12.92 if v / 255 <= 0.04045 else (((v / 255) + 0.055) / 1.055) ** 2.4 for v in range(256)
+]
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _components(pixels: bytes, width: int, height: int) -> List[Tuple[float, float, float]]:
+    linear = [_SRGB_TO_LINEAR[v] for v in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(X_COMPONENTS)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(Y_COMPONENTS)]
+    factors = []
+    for j in range(Y_COMPONENTS):
+        for i in range(X_COMPONENTS):
+            norm = 1.0 if i == 0 and j == 0 else 2.0
+            r = g = b = 0.0
+            for y in range(height):
+                cy = cos_y[j][y]
+                row = y * width * 3
+                for x in range(width):
+                    basis = cos_x[i][x] * cy
+                    idx = row + x * 3
+                    r += basis * linear[idx]
+                    g += basis * linear[idx + 1]
+                    b += basis * linear[idx + 2]
+            scale = norm / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+    return factors
+
+
+def blurhash(img: Image.Image) -> str:
+    """Encode an already-open image as a BlurHash string."""
+    if img.format == "JPEG":
+        # Let libjpeg decode at 1/8 scale; we only need a 32px sample.
+        img.draft("RGB", (SAMPLE_SIDE * 2, SAMPLE_SIDE * 2))
+    sample = img.convert("RGB")
+    sample.thumbnail((SAMPLE_SIDE, SAMPLE_SIDE))
+    factors = _components(sample.tobytes(), sample.width, sample.height)
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((X_COMPONENTS - 1) + (Y_COMPONENTS - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(v) for f in ac for v in f)
+        quantised = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised + 1) / 166
+        result += _base83(quantised, 1)
+    else:
+        max_value = 1.0
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for r, g, b in ac:
+        qr, qg, qb = (max(0, min(18, int(_sign_pow(v / max_value, 0.5) * 9 + 9.5))) for v in (r, g, b))
+        result += _base83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
@@ -0,0 +1,351 @@
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+from tqdm import tqdm
+
+from encoders import DEFAULT_PROFILE, PROFILES, encode_best, profile_for_source
+from normalize import SWAPPED_ORIENTATIONS, changes_pixels, normalize, orientation, strip_metadata
+from staging import Journal, atomic_write_bytes
+
+ResamplingAttr = getattr(Image, "Resampling", None)
+if ResamplingAttr:
+    RESAMPLE: Any = getattr(ResamplingAttr, "LANCZOS", getattr(ResamplingAttr, "BICUBIC", getattr(ResamplingAttr, "NEAREST", 1)))
+else:
+    RESAMPLE: Any = getattr(Image, "LANCZOS", getattr(Image, "BICUBIC", getattr(Image, "NEAREST", 1)))
+
+# Resample in steps no larger than this multiple of the target before the
+# final Lanczos pass; 2x keeps the result indistinguishable from one pass.
+REDUCING_GAP = 2.0
+# JPEG DCT scaling may land anywhere at or above the target: each halving
+# skipped costs 4x the decode memory, and the Lanczos pass that follows does
+# the actual filtering. (At REDUCING_GAP a 24MP source to 1600x1200 would
+# need 3200px and so never draft at all.)
+DRAFT_GAP = 1.0
+JPEG_DRAFT_SCALES = (8, 4, 2, 1)
+# Rough resident cost of one worker before it touches an image.
+WORKER_OVERHEAD = 96 * 1024 * 1024
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+@dataclass
+class ResizeResult:
+    path: str
+    error: str = ""
+    bytes_in: int = 0
+    bytes_out: int = 0
+    quality: Optional[int] = None
+    # EXIF/XMP/ICC/comment bytes the source carried and the output does not.
+    metadata_bytes: int = 0
+    # Seconds spent per phase (decode, normalize, resample, encode, write) in the worker.
+    timings: Dict[str, float] = field(default_factory=dict)
+    started: float = 0.0
+    worker: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+class _PhaseTimer:
+    """Accumulates per-phase wall time for one file inside a worker."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.timings: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def result(self, file_path: str, **kwargs) -> ResizeResult:
+        return ResizeResult(file_path, timings=self.timings, started=self.started, worker=os.getpid(), **kwargs)
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def parse_memory(text: str) -> int:
+    """Parse a byte count such as ``512M``, ``4G`` or ``1.5GB`` (argparse type)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"not a memory size: {text!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def _draft_box(source: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    ratio = min(box[0] / source[0], box[1] / source[1], 1.0)
+    return max(1, int(source[0] * ratio * DRAFT_GAP)), max(1, int(source[1] * ratio * DRAFT_GAP))
+
+
+def _draft_scale(source: Tuple[int, int], draft: Tuple[int, int]) -> int:
+    """The DCT scale Pillow's JPEG ``draft`` picks for ``draft`` (same rule)."""
+    fit = min(source[0] // draft[0], source[1] // draft[1])
+    return next(s for s in JPEG_DRAFT_SCALES if s <= fit or s == 1)
+
+
+def _load_reduced(img: Image.Image, box: Tuple[int, int]) -> None:
+    """Decode ``img`` no larger than needed for ``box`` (JPEG: 1/2..1/8 DCT scaling).
+
+    A no-op draft for other formats, which are decoded at full size.
+    """
+    img.draft(None, _draft_box(img.size, box))
+    img.load()
+
+
+def _task_box(spec: Any, source: Tuple[int, int]) -> Tuple[int, int]:
+    # resize_one tasks carry a (width, height) box, derive_one a [(width, dest)] list.
+    if isinstance(spec, tuple) and len(spec) == 2 and all(isinstance(v, int) for v in spec):
+        return spec
+    return max(width for width, _ in spec), source[1]
+
+
+def estimate_task_memory(task: Tuple[Any, ...]) -> int:
+    """Estimate peak bytes a worker needs for a resize/derive task.
+
+    Reads only the image header: decoded size after any JPEG draft scaling,
+    times two for the resampled copy and encoder buffers, plus worker overhead.
+    """
+    try:
+        with Image.open(task[0]) as img:
+            width, height = img.size
+            bands = max(3, len(img.getbands()))
+            box = _task_box(task[1], img.size)
+            if orientation(img) in SWAPPED_ORIENTATIONS:
+                box = box[::-1] if isinstance(task[1], tuple) else (width, box[0])
+            scale = _draft_scale(img.size, _draft_box(img.size, box)) if img.format == "JPEG" else 1
+    except (OSError, ValueError):
+        return WORKER_OVERHEAD
+    return WORKER_OVERHEAD + 2 * -(-width // scale) * -(-height // scale) * bands
+
+
+def resize_one(file_path: str, size: Tuple[int, int], profile_name: str = DEFAULT_PROFILE) -> ResizeResult:
+    # Runs inside worker processes, so keep it self-contained and never raise.
+    timer = _PhaseTimer()
+    try:
+        bytes_in = os.path.getsize(file_path)
+        with Image.open(file_path) as source:
+            source_format = source.format
+            transformed = changes_pixels(source)
+            turned = orientation(source) in SWAPPED_ORIENTATIONS
+            # The size target applies to the photo as displayed, i.e. after rotation.
+            _load_reduced(source, size[::-1] if turned else size)
+            timer.lap("decode")
+            img, stripped = normalize(source)
+            original_size = img.size
+            timer.lap("normalize")
+            img.thumbnail(size, RESAMPLE, reducing_gap=REDUCING_GAP)
+            timer.lap("resample")
+            profile = profile_for_source(PROFILES[profile_name], source_format)
+            data, quality = encode_best(img, profile, source_format)
+            shrunk = img.size != original_size
+            timer.lap("encode")
+        if not shrunk and not transformed and len(data) >= bytes_in:
+            # Already web-sized, upright and sRGB: a re-encode would only add
+            # generation loss. Keep the pixels and drop any metadata losslessly.
+            with open(file_path, "rb") as f:
+                data = strip_metadata(f.read(), source_format)
+            if data is None or len(data) >= bytes_in:
+                return timer.result(file_path, bytes_in=bytes_in, bytes_out=bytes_in)
+            quality, stripped = None, bytes_in - len(data)
+        # Staged and renamed, so an interrupted run never leaves a truncated original.
+        atomic_write_bytes(file_path, data)
+        timer.lap("write")
+    except (OSError, ValueError) as exc:
+        return timer.result(file_path, error=f"{type(exc).__name__}: {exc}")
+    return timer.result(file_path, bytes_in=bytes_in, bytes_out=len(data), quality=quality, metadata_bytes=stripped)
+
+
+def derive_one(file_path: str, targets: List[Tuple[int, str]], profile_name: str = DEFAULT_PROFILE) -> ResizeResult:
+    """Write one downscaled copy of ``file_path`` per ``(width, dest_path)``.
+
+    ``bytes_in`` counts the source once per variant, since each variant is
+    served in place of the full-size file. Variants are normalized (upright,
+    sRGB, no metadata) whether or not the source already is.
+    """
+    profile = PROFILES[profile_name]
+    timer = _PhaseTimer()
+    try:
+        bytes_in = os.path.getsize(file_path) * len(targets)
+        bytes_out = 0
+        stripped = 0
+        with Image.open(file_path) as source:
+            source_format = source.format
+            # Heights follow the original aspect ratio, not the draft's rounding.
+            source_width, source_height = source.size
+            box = _task_box(targets, source.size)
+            if orientation(source) in SWAPPED_ORIENTATIONS:
+                # Target widths are displayed widths, i.e. stored heights.
+                source_width, source_height = source_height, source_width
+                box = (source.width, box[0])
+            _load_reduced(source, box)
+            timer.lap("decode")
+            img, stripped = normalize(source)
+            timer.lap("normalize")
+            for width, dest_path in sorted(targets, reverse=True):
+                height = max(1, round(source_height * width / source_width))
+                resized = img.resize((width, height), RESAMPLE, reducing_gap=REDUCING_GAP)
+                timer.lap("resample")
+                data, _ = encode_best(resized, profile, source_format)
+                timer.lap("encode")
+                Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
+                atomic_write_bytes(dest_path, data)
+                timer.lap("write")
+                bytes_out += len(data)
+    except (OSError, ValueError) as exc:
+        return timer.result(file_path, error=f"{type(exc).__name__}: {exc}")
+    return timer.result(file_path, bytes_in=bytes_in, bytes_out=bytes_out, metadata_bytes=stripped * len(targets))
+
+
+def run_batch(
+    worker: Callable[..., ResizeResult],
+    tasks: List[Tuple[Any, ...]],
+    jobs: Optional[int] = None,
+    desc: str = "Processing",
+    max_memory: Optional[int] = None,
+    journal: Optional[Journal] = None,
+) -> List[ResizeResult]:
+    """Call ``worker(*task)`` for every task, fanning out over a process pool.
+
+    Results come back in the same order as ``tasks`` regardless of which
+    worker finishes first; a failing file is reported, not raised.
+
+    With ``max_memory`` set, tasks are admitted in order only while the
+    estimated memory of everything in flight stays within the budget, so a
+    run of huge originals narrows the pool instead of exhausting RAM. A task
+    bigger than the whole budget still runs, alone.
+
+    With a ``journal``, each finished file is recorded as it completes and
+    files the journal already has (unchanged since) are not run again; their
+    recorded results are returned in place. The journal is closed out once
+    every file has succeeded, so ``--resume`` after failures retries only those.
+    """
+    jobs = max(1, jobs or default_jobs())
+    results: List[Optional[ResizeResult]] = [None] * len(tasks)
+    pending = list(range(len(tasks)))
+    if journal is not None:
+        for idx, task in enumerate(tasks):
+            recorded = journal.finished(str(task[0]))
+            if recorded is not None:
+                results[idx] = ResizeResult(**{**recorded, "timings": {}})
+        pending = [idx for idx in pending if results[idx] is None]
+        if len(pending) < len(tasks):
+            print(f"Resuming: {len(tasks) - len(pending)} of {len(tasks)} file(s) already done.")
+
+    def finish(idx: int, result: ResizeResult) -> None:
+        results[idx] = result
+        if journal is not None:
+            journal.record(str(tasks[idx][0]), result)
+
+    if jobs == 1 or len(pending) <= 1:
+        for idx in tqdm(pending, desc=desc, unit="file"):
+            finish(idx, worker(*tasks[idx]))
+    else:
+        _run_pool(worker, tasks, pending, jobs, desc, max_memory, finish)
+    done = [r for r in results if r is not None]
+    if journal is not None and all(r.ok for r in done):
+        journal.complete()
+    return done
+
+
+def _run_pool(
+    worker: Callable[..., ResizeResult],
+    tasks: List[Tuple[Any, ...]],
+    pending: List[int],
+    jobs: int,
+    desc: str,
+    max_memory: Optional[int],
+    finish: Callable[[int, ResizeResult], None],
+) -> None:
+    workers = min(jobs, len(pending))
+    costs = {idx: estimate_task_memory(tasks[idx]) if max_memory else 0 for idx in pending}
+    if max_memory and max(costs.values()) > max_memory:
+        print("Note: some files need more than --max-memory on their own; they will run one at a time.")
+    queue = deque(pending)
+    in_flight = {}
+    used = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(total=len(pending), desc=desc, unit="file") as bar:
+        try:
+            while queue or in_flight:
+                while queue:
+                    idx = queue[0]
+                    if max_memory and in_flight and (len(in_flight) >= workers or used + costs[idx] > max_memory):
+                        break
+                    queue.popleft()
+                    used += costs[idx]
+                    in_flight[pool.submit(worker, *tasks[idx])] = idx
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx = in_flight.pop(future)
+                    used -= costs[idx]
+                    try:
+                        result = future.result()
+                    except Exception as exc:  # worker crashed (e.g. killed by the OS)
+                        result = ResizeResult(str(tasks[idx][0]), f"{type(exc).__name__}: {exc}")
+                    finish(idx, result)
+                    bar.update()
+        except BaseException:
+            # Interrupted: drop queued files, let running ones land, and still
+            # record those so a resumed run does not redo them.
+            pool.shutdown(wait=True, cancel_futures=True)
+            for future, idx in in_flight.items():
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    finish(idx, future.result())
+            raise
+
+
+def resize_files(
+    paths: Iterable[Path],
+    size: Tuple[int, int],
+    jobs: Optional[int] = None,
+    desc: str = "Resizing",
+    profile: str = DEFAULT_PROFILE,
+    max_memory: Optional[int] = None,
+    journal: Optional[Journal] = None,
+) -> List[ResizeResult]:
+    """Resize every file in place; results are returned in sorted path order."""
+    files = sorted(str(p) for p in paths)
+    tasks = [(file_path, size, profile) for file_path in files]
+    return run_batch(resize_one, tasks, jobs=jobs, desc=desc, max_memory=max_memory, journal=journal)
+
+
+def report_errors(results: List[ResizeResult], action: str = "resized") -> int:
+    failed = [r for r in results if not r.ok]
+    if failed:
+        print(f"\n{len(failed)} of {len(results)} file(s) could not be {action}:")
+        for r in failed:
+            print(f" - {r.path}: {r.error}")
+    return len(failed)
+
+
+def format_bytes(count: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(count) < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+def report_savings(label: str, results: List[ResizeResult]) -> int:
+    done = [r for r in results if r.ok]
+    if not done:
+        return 0
+    before = sum(r.bytes_in for r in done)
+    after = sum(r.bytes_out for r in done)
+    saved = before - after
+    percent = (saved / before * 100) if before else 0.0
+    stripped = [r for r in done if r.metadata_bytes]
+    metadata = ""
+    if stripped:
+        metadata = f"; {format_bytes(sum(r.metadata_bytes for r in stripped))} of metadata stripped from {len(stripped)} file(s)"
+    print(f"{label}: {len(done)} file(s), {format_bytes(before)} -> {format_bytes(after)} (saved {format_bytes(saved)}, {percent:.0f}%{metadata})")
+    return saved
@@ -0,0 +1,303 @@
+import argparse
+import hashlib
+import json
+import mimetypes
+import posixpath
+import re
+import threading
+import time
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+# Stdlib only: a local stand-in for Firebase Hosting, for checking cache
+# headers and transfer sizes without deploying.
+ROOT = Path(__file__).resolve().parent.parent
+FIREBASE_JSON = ROOT / "firebase.json"
+DEFAULT_PORT = 5000
+CHUNK_SIZE = 1 << 16
+# Preferred first; only used when the client accepts it and a sibling exists.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("application/json", ".json")
+mimetypes.add_type("text/javascript", ".js")
+
+
+def glob_to_regex(pattern: str) -> "re.Pattern":
+    """Translate a Firebase Hosting glob (``**``, ``*``, ``?``, ``@(a|b)``, ``{a,b}``)."""
+    out, i = [], 0
+    pattern = pattern.lstrip("/")
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern.startswith("@(", i) or pattern[i] == "{":
+            close = pattern.find(")" if pattern[i] == "@" else "}", i)
+            options = pattern[i + (2 if pattern[i] == "@" else 1):close]
+            out.append("(?:" + "|".join(re.escape(o) for o in re.split(r"[|,]", options)) + ")")
+            i = close + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + "$")
+
+
+class HostingConfig:
+    """The parts of ``firebase.json`` that decide what a response looks like."""
+
+    def __init__(self, path: Path = FIREBASE_JSON):
+        with open(path, "r", encoding="utf-8") as f:
+            hosting = json.load(f).get("hosting", {})
+        if isinstance(hosting, list):
+            hosting = hosting[0]
+        self.public = path.parent / hosting.get("public", "public")
+        self.ignore = [glob_to_regex(p) for p in hosting.get("ignore", [])]
+        self.headers = [
+            (glob_to_regex(rule["source"]), {h["key"]: h["value"] for h in rule.get("headers", [])})
+            for rule in hosting.get("headers", [])
+            if "source" in rule
+        ]
+
+    def headers_for(self, rel: str) -> Dict[str, str]:
+        # Every matching rule applies, later rules overriding earlier ones.
+        merged: Dict[str, str] = {}
+        for regex, values in self.headers:
+            if regex.match(rel):
+                merged.update(values)
+        return merged
+
+    def ignored(self, rel: str) -> bool:
+        return any(regex.match(rel) for regex in self.ignore)
+
+
+@lru_cache(maxsize=4096)
+def _etag(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def etag(path: Path) -> str:
+    st = path.stat()
+    return _etag(str(path), st.st_size, st.st_mtime_ns)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` for a single byte range; None if unsatisfiable.
+
+    Raises ValueError for anything this server does not handle (e.g. several
+    ranges), in which case the whole file is sent.
+    """
+    match = RANGE.match(header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        raise ValueError(header)
+    first, last = match.group(1), match.group(2)
+    if not first:
+        length = int(last)
+        return (max(0, size - length), size - 1) if length and size else None
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    return (start, end) if start <= end and start < size else None
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.by_status: Dict[int, int] = {}
+
+    def add(self, status: int, sent: int) -> None:
+        with self.lock:
+            self.requests += 1
+            self.bytes += sent
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+
+    def summary(self) -> str:
+        statuses = ", ".join(f"{code}: {n}" for code, n in sorted(self.by_status.items()))
+        return f"{self.requests} request(s), {self.bytes / 1024:.1f} KB sent ({statuses})"
+
+
+class HostingHandler(BaseHTTPRequestHandler):
+    server_version = "LocalHosting/1.0"
+    protocol_version = "HTTP/1.1"
+    config: HostingConfig
+    root: Path
+    stats: Stats
+    log_file = None
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _resolve(self) -> Tuple[Optional[Path], str]:
+        rel = posixpath.normpath(unquote(urlsplit(self.path).path)).lstrip("/")
+        if rel in ("", "."):
+            rel = "index.html"
+        path = (self.root / rel).resolve()
+        if path.is_dir():
+            rel = posixpath.join(rel, "index.html")
+            path = path / "index.html"
+        if self.root not in path.parents or self.config.ignored(rel) or not path.is_file():
+            return None, rel
+        return path, rel
+
+    def _pick_encoding(self, path: Path) -> Tuple[Path, str]:
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in self.headers.get("Accept-Encoding", "").split(",")
+            if not part.strip().endswith(";q=0")
+        }
+        for encoding, suffix in ENCODINGS:
+            sibling = path.with_name(path.name + suffix)
+            if encoding in accepted and sibling.is_file():
+                return sibling, encoding
+        return path, ""
+
+    def _serve(self, send_body: bool) -> None:
+        started = time.perf_counter()
+        path, rel = self._resolve()
+        status = HTTPStatus.OK
+        if path is None:
+            status = HTTPStatus.NOT_FOUND
+            path = self.root / "404.html"
+            if not path.is_file():
+                body = b"Not Found"
+                self._finish(status, {"Content-Type": "text/plain", "Content-Length": str(len(body))})
+                sent = len(body) if send_body else 0
+                if send_body:
+                    self.wfile.write(body)
+                self._log(status, sent, rel, "", started)
+                return
+
+        body_path, encoding = self._pick_encoding(path)
+        size = body_path.stat().st_size
+        headers = {
+            "Content-Type": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        headers.update(self.config.headers_for(rel))
+        tag = etag(body_path)
+        headers["ETag"] = tag
+
+        if status == HTTPStatus.OK and tag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self._finish(HTTPStatus.NOT_MODIFIED, {k: v for k, v in headers.items() if k != "Content-Type"})
+            self._log(HTTPStatus.NOT_MODIFIED, 0, rel, encoding, started)
+            return
+
+        start, end = 0, size - 1
+        range_header = self.headers.get("Range")
+        if status == HTTPStatus.OK and range_header and self.headers.get("If-Range", tag) == tag:
+            try:
+                span = parse_range(range_header, size)
+            except ValueError:
+                span = (0, size - 1)
+            if span is None:
+                headers["Content-Range"] = f"bytes */{size}"
+                headers["Content-Length"] = "0"
+                self._finish(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers)
+                self._log(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, 0, rel, encoding, started)
+                return
+            if span != (0, size - 1):
+                start, end = span
+                status = HTTPStatus.PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        length = max(0, end - start + 1)
+        headers["Content-Length"] = str(length)
+        self._finish(status, headers)
+        sent = 0
+        if send_body:
+            with open(body_path, "rb") as f:
+                f.seek(start)
+                remaining = length
+                while remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    remaining -= len(chunk)
+        self._log(status, sent, rel, encoding, started)
+
+    def _finish(self, status: int, headers: Dict[str, str]) -> None:
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def _log(self, status: int, sent: int, rel: str, encoding: str, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats.add(int(status), sent)
+        cache = self.config.headers_for(rel).get("Cache-Control", "-")
+        print(f"{int(status)} {self.command:<4} /{rel:<60} {sent:>9} B {encoding or 'identity':<8} {elapsed:6.1f} ms  {cache}")
+        if self.log_file:
+            record = {
+                "time": time.time(), "method": self.command, "path": "/" + rel, "status": int(status),
+                "bytes": sent, "encoding": encoding or "identity", "ms": round(elapsed, 2), "cacheControl": cache,
+            }
+            with self.stats.lock:
+                self.log_file.write(json.dumps(record) + "\n")
+                self.log_file.flush()
+
+    def log_message(self, format, *args):
+        # Requests are logged by _log; keep http.server's own lines quiet.
+        pass
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve the site locally with firebase.json headers, ETags, ranges and precompressed files.")
+    parser.add_argument("--config", type=Path, default=FIREBASE_JSON, help="hosting config (default: firebase.json)")
+    parser.add_argument("--root", type=Path, help="directory to serve (default: the config's public dir, else public/)")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--log", type=Path, help="also append one JSON line per request to this file")
+    args = parser.parse_args(argv)
+
+    config = HostingConfig(args.config)
+    root = args.root or config.public
+    if not root.is_dir():
+        print(f"{root} does not exist (run `python scripts/fingerprint.py` to build it); serving public/ instead.")
+        root = ROOT / "public"
+
+    HostingHandler.config = config
+    HostingHandler.root = root.resolve()
+    HostingHandler.stats = Stats()
+    HostingHandler.log_file = open(args.log, "a", encoding="utf-8") if args.log else None
+    server = ThreadingHTTPServer((args.host, args.port), HostingHandler)
+    print(f"Serving {root} at http://{args.host}:{args.port}/ with headers from {args.config} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n{HostingHandler.stats.summary()}")
+        if HostingHandler.log_file:
+            HostingHandler.log_file.close()
+
+
+if __name__ == "__main__":
+    main()
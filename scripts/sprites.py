@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageOps
+
+from normalize import normalize
+from resize_engine import REDUCING_GAP, RESAMPLE
+from staging import atomic_write_bytes
+
+ROOT = Path(__file__).resolve().parent.parent
+SPRITES_DIR = ROOT / "public" / "sprites"
+# One cell per gallery cover, cropped to roughly the homepage card's shape;
+# the full cover still loads on top once the card scrolls into view.
+CELL_SIZE = (320, 368)
+SHEET_COLUMNS = 4
+SHEET_CELLS = 12
+# Blank pixels between cells so scaled backgrounds never bleed into a neighbour.
+GUTTER = 4
+QUALITY = 78
+# Bump when the layout or encoding changes, so old sheets get new names.
+SPRITE_VERSION = 1
+
+
+def _sheet_key(covers: List[Tuple[str, Path]]) -> str:
+    """Names plus size and mtime of every source: cheap, and changes with any of them."""
+    digest = hashlib.sha256(f"{SPRITE_VERSION}:{CELL_SIZE}:{SHEET_COLUMNS}:{GUTTER}:{QUALITY}".encode())
+    for name, path in covers:
+        st = path.stat()
+        digest.update(f"\n{name}\n{path.name}\n{st.st_size}\n{st.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:10]
+
+
+def _cell_origin(slot: int) -> Tuple[int, int]:
+    column, row = slot % SHEET_COLUMNS, slot // SHEET_COLUMNS
+    return GUTTER + column * (CELL_SIZE[0] + GUTTER), GUTTER + row * (CELL_SIZE[1] + GUTTER)
+
+
+def _sheet_size(count: int) -> Tuple[int, int]:
+    columns = min(SHEET_COLUMNS, count)
+    rows = -(-count // SHEET_COLUMNS)
+    return GUTTER + columns * (CELL_SIZE[0] + GUTTER), GUTTER + rows * (CELL_SIZE[1] + GUTTER)
+
+
+def _thumbnail(path: Path) -> Image.Image:
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            # Covers are cropped, so the short side only needs to reach the cell.
+            scale = max(CELL_SIZE[0] / img.width, CELL_SIZE[1] / img.height) * REDUCING_GAP
+            img.draft("RGB", (round(img.width * scale), round(img.height * scale)))
+        img, _ = normalize(img)
+        return ImageOps.fit(img.convert("RGB"), CELL_SIZE, RESAMPLE, centering=(0.5, 0.5))
+
+
+def render_sheet(covers: List[Tuple[str, Path]]) -> bytes:
+    sheet = Image.new("RGB", _sheet_size(len(covers)), (249, 247, 244))
+    for slot, (_, path) in enumerate(covers):
+        sheet.paste(_thumbnail(path), _cell_origin(slot))
+    out = io.BytesIO()
+    sheet.save(out, "JPEG", quality=QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def write_cover_sprites(covers: List[Tuple[str, Path]], out_dir: Path = SPRITES_DIR) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """Pack gallery covers into sheets of up to ``SHEET_CELLS`` thumbnails.
+
+    ``covers`` is ``(gallery name, cover path)`` in homepage order, so the
+    first sheet holds the first covers a visitor sees. Sheet names carry a
+    hash of their inputs: an unchanged sheet is not re-rendered, and a
+    changed one gets a new URL (safe to cache as immutable). Returns the
+    sheet list for the index and each gallery's cell within it.
+    """
+    covers = [(name, path) for name, path in covers if path.is_file()]
+    sheets: List[Dict] = []
+    cells: Dict[str, Dict] = {}
+    keep = set()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for number, start in enumerate(range(0, len(covers), SHEET_CELLS)):
+        chunk = covers[start:start + SHEET_CELLS]
+        filename = f"covers-{number}.{_sheet_key(chunk)}.jpg"
+        dest = out_dir / filename
+        size = _sheet_size(len(chunk))
+        if not dest.exists():
+            atomic_write_bytes(dest, render_sheet(chunk))
+        keep.add(filename)
+        sheets.append({"url": f"{out_dir.name}/{filename}", "width": size[0], "height": size[1]})
+        for slot, (name, _) in enumerate(chunk):
+            x, y = _cell_origin(slot)
+            cells[name] = {"sheet": number, "x": x, "y": y, "w": CELL_SIZE[0], "h": CELL_SIZE[1]}
+    for stale in out_dir.glob("covers-*.jpg"):
+        if stale.name not in keep:
+            os.remove(stale)
+    return sheets, cells
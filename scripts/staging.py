@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+ROOT = Path(__file__).resolve().parent.parent
+JOURNAL_DIR = ROOT / ".cache" / "journal"
+
+
+def staging_path(path: Path) -> Path:
+    """Hidden sibling a file is written to before being renamed into place.
+
+    Same directory, so the rename never crosses filesystems; the leading dot
+    keeps it out of image listings, dist/ and Firebase uploads.
+    """
+    return path.with_name(f".{path.name}.tmp")
+
+
+def atomic_write_bytes(path: Union[str, Path], data: bytes) -> None:
+    """Replace ``path`` with ``data`` so readers see the old file or the new one, never half."""
+    path = Path(path)
+    tmp = staging_path(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_text(path: Union[str, Path], text: str) -> None:
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def _stat_key(path: str) -> Optional[list]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Journal:
+    """Append-only record of the files a batch has finished.
+
+    One JSON line per file, flushed as each result arrives, so an interrupted
+    batch leaves an exact list of what is done. A resumed batch skips a file
+    only if it still has the size and mtime recorded when it finished. The
+    journal is deleted once its batch completes.
+    """
+
+    def __init__(self, name: str, resume: bool = False, directory: Path = JOURNAL_DIR):
+        self.path = directory / (re.sub(r"[^A-Za-z0-9_.-]+", "-", name).strip("-") + ".jsonl")
+        self.entries: Dict[str, dict] = {}
+        self._file = None
+        if not self.path.exists():
+            return
+        if not resume:
+            print(f"Discarding the journal of an unfinished run ({self.path.name}); pass --resume to continue it instead.")
+            self.path.unlink()
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The line being written when the run died.
+                    continue
+                self.entries[record["key"]] = record
+
+    def finished(self, key: str) -> Optional[Dict[str, Any]]:
+        """The recorded result fields for ``key`` if it finished and is unchanged since."""
+        record = self.entries.get(key)
+        if record is None or _stat_key(key) != record["stat"]:
+            return None
+        return record["result"]
+
+    def record(self, key: str, result: Any) -> None:
+        """Note a finished file; ``result`` is a dataclass such as ``ResizeResult``."""
+        if getattr(result, "error", ""):
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        record = {"key": key, "stat": _stat_key(key), "time": time.time(), "result": asdict(result)}
+        self.entries[key] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def complete(self) -> None:
+        """The batch finished; nothing is left to resume."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.path.unlink(missing_ok=True)
+        self.entries.clear()
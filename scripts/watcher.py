@@ -0,0 +1,156 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# inotify constants from <sys/inotify.h>.
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Detects changes by re-listing the watched directories (one level deep).
+
+    Works everywhere; costs one ``scandir`` per directory per poll.
+    """
+
+    name = "polling"
+
+    def __init__(self, roots: Iterable[Path], interval: float = 1.0):
+        self.roots = [Path(r) for r in roots]
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        state: Dict[Path, Tuple[int, int]] = {}
+        pending = list(self.roots)
+        while pending:
+            root = pending.pop()
+            try:
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if entry.name.startswith("."):
+                            continue
+                        st = entry.stat()
+                        state[Path(entry.path)] = (st.st_size, st.st_mtime_ns)
+                        if entry.is_dir() and root in self.roots:
+                            pending.append(Path(entry.path))
+            except FileNotFoundError:
+                continue
+        return state
+
+    def changes(self, timeout: float) -> Set[Path]:
+        """Block up to ``timeout`` seconds; return paths added, removed or modified."""
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {p for p in current.keys() | self.snapshot.keys() if current.get(p) != self.snapshot.get(p)}
+            self.snapshot = current
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify through libc, watching each root and its subdirectories."""
+
+    name = "inotify"
+
+    def __init__(self, roots: Iterable[Path]):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, Path] = {}
+        self.roots = [Path(r) for r in roots]
+        for root in self.roots:
+            self._add(root)
+            if root.is_dir():
+                for entry in os.scandir(root):
+                    if entry.is_dir() and not entry.name.startswith("."):
+                        self._add(Path(entry.path))
+
+    def _add(self, path: Path) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {path}")
+        self.dirs[wd] = path
+
+    def changes(self, timeout: float) -> Set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not ready:
+            return set()
+        changed: Set[Path] = set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            raw = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            parent = self.dirs.get(wd)
+            if parent is None or not raw:
+                continue
+            path = parent / os.fsdecode(raw)
+            changed.add(path)
+            # New gallery folders directly under a root get their own watch.
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and parent in self.roots:
+                try:
+                    self._add(path)
+                except OSError:
+                    pass
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def make_watcher(roots: List[Path], polling: bool = False, interval: float = 1.0):
+    """inotify on Linux unless ``polling`` is set or it is unavailable."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as exc:
+            print(f"inotify unavailable ({exc}); falling back to polling every {interval:g}s.")
+    return PollingWatcher(roots, interval)
+
+
+def collect(watcher, debounce: float, timeout: Optional[float] = None) -> Tuple[Set[Path], float]:
+    """Wait for a change, then keep gathering until ``debounce`` seconds pass quietly.
+
+    Returns the changed paths and the ``time.monotonic()`` of the first one.
+    A continuous stream of changes is cut off after 10x the debounce.
+    """
+    changed: Set[Path] = set()
+    while not changed:
+        changed = watcher.changes(timeout if timeout is not None else 3600.0)
+        if timeout is not None and not changed:
+            return changed, time.monotonic()
+    first = time.monotonic()
+    while time.monotonic() - first < debounce * 10:
+        more = watcher.changes(debounce)
+        if not more:
+            break
+        changed |= more
+    return changed, first
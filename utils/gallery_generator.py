@@ -1,6 +1,14 @@
+import argparse
 import os
 import json
 import difflib
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import instrumentation
+from image_index import MANIFEST_NAME, ImageIndex
+from staging import atomic_write_text
 
 def _ensure_jpg_extension(name: str) -> str:
     base, ext = os.path.splitext(name.strip())
@@ -72,7 +80,8 @@ def _choose_cover_photo_interactively(folder_path: str, default_cover: str, gall
         print("No selection made. Please try again or leave blank to keep default.")
 
 # generates galleries.json file for each subdirectory to add galleries
-def generate_galleries_json(directory):
+def generate_galleries_json(directory, index=None):
+    """Write galleries.json for every subdirectory; pass an ``ImageIndex`` to reuse an existing scan."""
     galleries = []
     existing_galleries = {}
 
@@ -81,47 +90,56 @@ def generate_galleries_json(directory):
     if os.path.exists(galleries_json_path):
         with open(galleries_json_path, 'r') as existing_file:
             existing_data = json.load(existing_file)
-            existing_galleries = {gallery['name']: gallery for gallery in existing_data.get('galleries', [])}
-
-    for root, dirs, files in os.walk(directory):
-        for folder in dirs:
-            folder_path = os.path.join(root, folder)
-            manifest_path = os.path.join(folder_path, 'manifest.json')
-            images = []
-            if os.path.exists(manifest_path):
-                with open(manifest_path, 'r') as manifest_file:
+        if 'accessSalt' in existing_data:
+            # Written by gallery_wizard.py from data/galleries.yaml; this legacy format would drop its shards and access data.
+            print(f"{galleries_json_path} is maintained by scripts/gallery_wizard.py; run its build instead. Left unchanged.")
+            return
+        existing_galleries = {gallery['name']: gallery for gallery in existing_data.get('galleries', [])}
+
+    if index is None:
+        with instrumentation.stage("scan"):
+            index = ImageIndex.scan(directory)
+    for rel in index.subfolders():
+        folder = os.path.basename(rel)
+        folder_path = os.path.join(directory, rel)
+        with instrumentation.stage("list", folder):
+            if rel in index.manifests:
+                with open(os.path.join(folder_path, MANIFEST_NAME), 'r') as manifest_file:
                     images = json.load(manifest_file)
             else:
-                # No manifest present; fall back to scanning image files directly
-                images = [f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-                images.sort()
-
-            if not images:
-                # Skip empty folders
-                continue
-
-            if folder in existing_galleries:
-                cover_photo = existing_galleries[folder].get('coverPhoto', images[0])
-            else:
-                cover_photo = images[0]
-                manual_entry = input(f"Do you want to manually enter the cover photo for {folder}? (yes/no): ").strip().lower()
-                if manual_entry == 'yes':
-                    cover_photo = _choose_cover_photo_interactively(folder_path, cover_photo, folder)
-
-            title = existing_galleries.get(folder, {}).get('title', folder.replace('-', ' ').title())
-            galleries.append({
-                "name": os.path.relpath(folder_path, directory).replace(os.sep, '-'),
-                "title": title,
-                "coverPhoto": cover_photo,
-                "description": f"{folder.replace('-', ' ')} collection"
-            })
+                # No manifest present; fall back to the scanned image files
+                images = index.images(rel)
+
+        if not images:
+            # Skip empty folders
+            continue
+
+        if folder in existing_galleries:
+            cover_photo = existing_galleries[folder].get('coverPhoto', images[0])
+        else:
+            cover_photo = images[0]
+            manual_entry = input(f"Do you want to manually enter the cover photo for {folder}? (yes/no): ").strip().lower()
+            if manual_entry == 'yes':
+                cover_photo = _choose_cover_photo_interactively(folder_path, cover_photo, folder)
+
+        title = existing_galleries.get(folder, {}).get('title', folder.replace('-', ' ').title())
+        galleries.append({
+            "name": rel.replace('/', '-'),
+            "title": title,
+            "coverPhoto": cover_photo,
+            "description": f"{folder.replace('-', ' ')} collection"
+        })
     galleries_json = {
         "galleries": galleries
     }
-    with open(galleries_json_path, 'w') as json_file:
-        json.dump(galleries_json, json_file, indent=4)
+    with instrumentation.stage("write json"):
+        atomic_write_text(galleries_json_path, json.dumps(galleries_json, indent=4))
     print(f"Generated {galleries_json_path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate public/images/galleries.json from the image folders.")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
     images_directory = os.path.join('public', 'images')
-    generate_galleries_json(images_directory)
\ No newline at end of file
+    generate_galleries_json(images_directory)
+    instrumentation.report(args)
\ No newline at end of file
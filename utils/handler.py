@@ -1,29 +1,91 @@
-import subprocess
+import argparse
 import os
+import sys
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(UTILS_DIR, '..', 'scripts'))
+sys.path.insert(0, UTILS_DIR)
+
+import instrumentation
+from encoders import DEFAULT_PROFILE, PROFILES
+from image_index import ImageIndex
+from resize_engine import default_jobs, parse_memory
+
+import gallery_generator
+import img_resizer
+import manifest_generator
+import secrets_setter
+
+ROOT = os.path.dirname(UTILS_DIR)
+IMAGES_DIR = os.path.join(ROOT, 'public', 'images')
+# In run order. Every stage but secrets works from the scan's index.
+STAGES = ('scan', 'resize', 'manifest', 'galleries', 'secrets')
+# galleries and secrets only run when asked for (--only): the site index and
+# passcodes now come from the gallery registry via scripts/gallery_wizard.py.
+DEFAULT_STAGES = ('scan', 'resize', 'manifest')
+
+
+def run_pipeline(stages=DEFAULT_STAGES, images_dir=IMAGES_DIR, folders=(), jobs=None, rebuild=False,
+                 encoder=DEFAULT_PROFILE, max_memory=None, resume=False):
+    """Run the chosen stages in order, in this process, over one scan of ``images_dir``.
+
+    The tree is listed once with ``os.scandir``; resize, manifest and
+    galleries all read that index instead of walking the tree themselves.
+    Resizing is irreversible, so it only touches the gallery ``folders``
+    named (as the standalone img_resizer does), never the whole tree.
+    Returns the index (None if no stage needed it).
+    """
+    index = None
+    if any(stage in stages for stage in ('scan', 'resize', 'manifest', 'galleries')):
+        with instrumentation.stage("scan"):
+            index = ImageIndex.scan(images_dir)
+        print(f"Indexed {len(index.files())} image(s) in {len(index.subfolders())} folder(s) under {images_dir}.")
+    if 'resize' in stages:
+        for folder in folders:
+            if folder not in index.folders:
+                print(f"Skipping resize of '{folder}': no such folder under {images_dir}.")
+                continue
+            img_resizer.resize_images(os.path.join(images_dir, folder), jobs=jobs, rebuild=rebuild, encoder=encoder,
+                                      max_memory=max_memory, resume=resume, index=index.subtree(folder))
+    if 'manifest' in stages:
+        manifest_generator.generate_manifest(images_dir, index)
+    if 'galleries' in stages:
+        gallery_generator.generate_galleries_json(images_dir, index)
+    if 'secrets' in stages:
+        secrets_setter.prompt_gallery_secret()
+    return index
+
+
+def selected_stages(only=None, skip=None):
+    chosen = only or DEFAULT_STAGES
+    return tuple(stage for stage in STAGES if stage in chosen and stage not in (skip or ()))
 
-def run_script(script_path):
-    if os.path.exists(script_path):
-        try:
-            subprocess.run(["python", script_path], check=True)
-            print(f"{script_path} ran successfully.")
-        except subprocess.CalledProcessError as e:
-            print(f"Error running {script_path}:\n{e}")
-    else:
-        print(f"{script_path} not found.")
 
 if __name__ == "__main__":
-    idiot_check = input("Please confirm you have uploaded the full resolution gallery to the file hosting site (github) prior to running this script. \nYour images are about to be irreversably compressed for website hosting. (yes/no): ")
-    if idiot_check.lower() != 'yes':
-        print("Make good decisions.")
-        exit()
-    scripts = [
-        'utils/img_resizer.py',
-        'utils/manifest_generator.py',
-        'utils/gallery_generator.py',
-        'utils/secrets_setter.py'
-    ]
-
-    for script in scripts:
-        run_script(script)
-        
-    print("All scripts executed. Move on to the next set of instructions!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Resize, index and publish the galleries under public/images in one pass.")
+    parser.add_argument('--only', nargs='+', choices=STAGES, metavar='STAGE', help=f"run just these stages ({', '.join(STAGES)}; default: {', '.join(DEFAULT_STAGES)})")
+    parser.add_argument('--skip', nargs='+', choices=STAGES, metavar='STAGE', help="run the default stages except these")
+    parser.add_argument('--folder', action='append', default=[], metavar='NAME', help="gallery folder under public/images to resize (repeatable; asked for if omitted)")
+    parser.add_argument('--jobs', type=int, default=default_jobs(), help="worker processes (default: CPU count)")
+    parser.add_argument('--encoder', default=DEFAULT_PROFILE, choices=list(PROFILES), help="encoder profile for rewritten files")
+    parser.add_argument('--rebuild', action='store_true', help="ignore the build cache and re-read every image")
+    parser.add_argument('--max-memory', type=parse_memory, metavar='SIZE', help="memory budget for parallel resizing, e.g. 4G (default: no limit)")
+    parser.add_argument('--resume', action='store_true', help="continue an interrupted resize from its journal instead of starting over")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    stages = selected_stages(args.only, args.skip)
+
+    folders = args.folder
+    if 'resize' in stages and not folders:
+        chosen = img_resizer.choose_directory(IMAGES_DIR)
+        folders = [chosen] if chosen else []
+    if 'resize' in stages and folders:
+        idiot_check = input("Please confirm you have uploaded the full resolution gallery to the file hosting site (github) prior to running this script. \nYour images are about to be irreversably compressed for website hosting. (yes/no): ")
+        if idiot_check.lower() != 'yes':
+            print("Make good decisions.")
+            exit()
+
+    run_pipeline(stages, folders=folders, jobs=args.jobs, rebuild=args.rebuild, encoder=args.encoder, max_memory=args.max_memory,
+                 resume=args.resume)
+    instrumentation.report(args)
+    print("All stages finished. Move on to the next set of instructions!")
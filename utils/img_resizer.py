@@ -1,42 +1,85 @@
-
-from PIL import Image
+import argparse
 import os
-from tqdm import tqdm
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import instrumentation
+from build_cache import BuildCache
+from encoders import DEFAULT_PROFILE, PROFILES, get_profile
+from image_index import ImageIndex
+from resize_engine import default_jobs, parse_memory, report_errors, report_savings, resize_files
+from staging import Journal
+
+RESIZE_EXTS = ('.png', '.jpg', '.jpeg', '.webp')
 
-def resize_images(directory, size=(1200, 900)):
+def _needs_resize(cache, file_path, size):
+    try:
+        return not cache.info(file_path).web_ready(size)
+    except OSError:
+        # Let the resize engine surface the error for this file.
+        return True
+
+def resize_images(directory, size=(1200, 900), jobs=None, rebuild=False, encoder=DEFAULT_PROFILE, max_memory=None, resume=False, index=None):
+    """Resize oversized images under ``directory``; pass an ``ImageIndex`` to reuse an existing scan."""
+    profile = get_profile(encoder)
+    cache = BuildCache(rebuild=rebuild)
     files_to_resize = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-                files_to_resize.append(os.path.join(root, file))
-    
-    for file_path in tqdm(files_to_resize, desc="Resizing images", unit="file"):
-        with Image.open(file_path) as img:
-            img.thumbnail(size, Image.LANCZOS)
-            img.save(file_path)
+    skipped = 0
+    label = os.path.basename(os.path.normpath(directory))
+    with instrumentation.stage("scan", label):
+        index = index or ImageIndex.scan(directory)
+        for file_path in map(str, index.files(RESIZE_EXTS)):
+            if _needs_resize(cache, file_path, size):
+                files_to_resize.append(file_path)
+            else:
+                skipped += 1
 
-if __name__ == "__main__":
-    base_directory = os.path.join('public', 'images')
+    if skipped:
+        print(f"Skipping {skipped} image(s) already within {size[0]}x{size[1]} and normalized.")
+    with instrumentation.stage("resize", label):
+        journal = Journal(f"resize-{label}", resume)
+        results = resize_files(files_to_resize, size, jobs=jobs, desc="Resizing images", profile=profile.name, max_memory=max_memory, journal=journal)
+    instrumentation.record_results("resize", label, results)
+    report_errors(results)
+    report_savings(label, results)
+    with instrumentation.stage("cache save"):
+        cache.save()
+
+def choose_directory(base_directory):
+    """Ask which gallery folder under ``base_directory`` to resize; None if there are none."""
     directories = [d for d in os.listdir(base_directory) if os.path.isdir(os.path.join(base_directory, d))]
     directories.sort()
     if not directories:
         print("No directories found.")
-    else:
-        print("Available directories:")
-        for i, d in enumerate(directories, start=1):
-            print(f"{i}. {d}")
-
-        while True:
-            choice = input("Enter the number of the directory you want to resize: ").strip()
-            if not choice.isdigit():
-                print("Please enter a valid number.")
-                continue
-            idx = int(choice)
-            if 1 <= idx <= len(directories):
-                chosen_directory = directories[idx - 1]
-                break
-            else:
-                print(f"Please enter a number between 1 and {len(directories)}.")
+        return None
+    print("Available directories:")
+    for i, d in enumerate(directories, start=1):
+        print(f"{i}. {d}")
+
+    while True:
+        choice = input("Enter the number of the directory you want to resize: ").strip()
+        if not choice.isdigit():
+            print("Please enter a valid number.")
+            continue
+        idx = int(choice)
+        if 1 <= idx <= len(directories):
+            return directories[idx - 1]
+        print(f"Please enter a number between 1 and {len(directories)}.")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resize one gallery folder under public/images in place.")
+    parser.add_argument('--jobs', type=int, default=default_jobs(), help="worker processes (default: CPU count)")
+    parser.add_argument('--encoder', default=DEFAULT_PROFILE, choices=list(PROFILES), help="encoder profile for rewritten files")
+    parser.add_argument('--rebuild', action='store_true', help="ignore the build cache and re-read every image")
+    parser.add_argument('--max-memory', type=parse_memory, metavar='SIZE', help="memory budget for parallel resizing, e.g. 4G (default: no limit)")
+    parser.add_argument('--resume', action='store_true', help="continue an interrupted run from its journal instead of starting over")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    base_directory = os.path.join('public', 'images')
+    chosen_directory = choose_directory(base_directory)
+    if chosen_directory:
         images_directory = os.path.join(base_directory, chosen_directory)
-        resize_images(images_directory)
+        resize_images(images_directory, jobs=args.jobs, rebuild=args.rebuild, encoder=args.encoder, max_memory=args.max_memory, resume=args.resume)
+        instrumentation.report(args)
@@ -1,18 +1,37 @@
+import argparse
 import os
 import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import instrumentation
+from image_index import MANIFEST_NAME, ImageIndex
+from staging import atomic_write_text
 
 # generates manifest.json files for each subdirectory to add photos
-def generate_manifest(directory):
-    for root, dirs, files in os.walk(directory):
-        for subdir in dirs:
-            subdir_path = os.path.join(root, subdir)
-            images = [f for f in os.listdir(subdir_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-            images.sort()
-            manifest_path = os.path.join(subdir_path, 'manifest.json')
-            with open(manifest_path, 'w') as manifest_file:
-                json.dump(images, manifest_file, indent=4)
-            print(f"Generated {manifest_path}")
+def generate_manifest(directory, index=None):
+    """Write a manifest per subdirectory; pass an ``ImageIndex`` to reuse an existing scan."""
+    if index is None:
+        with instrumentation.stage("scan"):
+            index = ImageIndex.scan(directory)
+    for rel in index.subfolders():
+        subdir = os.path.basename(rel)
+        manifest_path = os.path.join(directory, rel, MANIFEST_NAME)
+        text = json.dumps(index.images(rel), indent=4)
+        with instrumentation.stage("write json", subdir):
+            if rel in index.manifests:
+                with open(manifest_path, 'r') as manifest_file:
+                    if manifest_file.read() == text:
+                        continue
+            atomic_write_text(manifest_path, text)
+            index.manifests.add(rel)
+        print(f"Generated {manifest_path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write manifest.json into every folder under public/images.")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
     images_directory = os.path.join('public', 'images')
-    generate_manifest(images_directory)
\ No newline at end of file
+    generate_manifest(images_directory)
+    instrumentation.report(args)
\ No newline at end of file
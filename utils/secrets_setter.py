@@ -1,6 +1,11 @@
-import json
 import os
 import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from build_cache import BuildCache
+from gallery_wizard import ACCESS_DIR, REGISTRY_PATH, build_public_payload, load_registry, save_registry, write_public_files
 
 def is_valid_url(url):
     regex = re.compile(
@@ -13,17 +18,16 @@ def is_valid_url(url):
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
     return re.match(regex, url) is not None
 
-def add_gallery_secret(file_path, gallery_name, password, download_link):
-    if not os.path.exists(file_path):
-        print(f"File {file_path} does not exist.")
+# Passcodes live in the gallery registry; the site only ever sees the per-gallery access files built from it.
+def add_gallery_secret(gallery_name, password, download_link):
+    registry = load_registry()
+    entry = next((g for g in registry["galleries"] if g.get("name") == gallery_name), None)
+    if entry is None:
+        print(f"Gallery {gallery_name} is not in {REGISTRY_PATH}; add it with gallery_wizard.py first.")
         return
 
-    with open(file_path, 'r') as file:
-        secrets = json.load(file)
-
-    if gallery_name in secrets:
-        print(f"Gallery {gallery_name} already exists in the secrets file.")
-        print(f"Existing content: {secrets[gallery_name]}")
+    if entry.get("password") or entry.get("download_link"):
+        print(f"Gallery {gallery_name} already has a passcode or download link.")
         overwrite = input("Do you want to overwrite it? (yes/no): ").strip().lower()
         if overwrite != 'yes':
             print("Operation cancelled.")
@@ -33,20 +37,21 @@ def add_gallery_secret(file_path, gallery_name, password, download_link):
         print("Invalid download link.")
         return
 
-    secrets[gallery_name] = {
-        "password": password,
-        "downloadLink": download_link
-    }
-
-    with open(file_path, 'w') as file:
-        json.dump(secrets, file, indent=4)
-    print(f"Added {gallery_name} to {file_path}")
+    entry["password"] = password
+    entry["download_link"] = download_link
+    save_registry(registry)
+    cache = BuildCache()
+    write_public_files(build_public_payload(registry, cache))
+    cache.save()
+    print(f"Updated {gallery_name} in {REGISTRY_PATH} and rewrote the access files in {ACCESS_DIR}")
 
-if __name__ == "__main__":
-    file_path = os.path.join('public', 'secrets.json')
-    print("\nWe will now generate metadata for a new gallery:")
+def prompt_gallery_secret():
+    print("\nWe will now set the passcode for a gallery:")
     gallery_name = input("Enter the gallery name: ")
-    password = input("Enter the password for the gallery: ")
+    password = input("Enter the passcode for the gallery (blank for none): ")
     download_link = input("Enter the download link: ")
 
-    add_gallery_secret(file_path, gallery_name, password, download_link)
\ No newline at end of file
+    add_gallery_secret(gallery_name, password, download_link)
+
+if __name__ == "__main__":
+    prompt_gallery_secret()